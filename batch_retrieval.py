@@ -0,0 +1,250 @@
+import gc
+import multiprocessing
+import os
+import torch
+import traceback
+
+from typing import List, Dict, Any, Iterable, Iterator, Tuple
+from phonenumbers import PhoneMetadata
+from postal.parser import parse_address
+
+from contact_data import ContactData
+from contact_data_retrieval import ContactDataRetrieval
+from extractors.extracting_tasks import NERExtractingTask
+from persistent_cache import PersistentCache
+
+_filters: List[str] = None
+_settings: Dict[str, Dict[str, Any]] = None
+
+
+class BatchResult:
+    """
+    This is a class to save the outcome of the contact data retrieval for one document of a batch.
+
+    Instance variables:
+        - index: Position of the document in the batch.
+        - blocks: Retrieved contact data blocks, None if the retrieval failed.
+        - error: Representation of the raised exception, None if the retrieval succeeded.
+        - traceback: Formatted traceback of the raised exception, None if the retrieval succeeded.
+        - worker: Process id of the worker that processed the document.
+        - memory: Resident, proportional, shared and private memory of the worker in bytes after processing the
+            document as read by memory_usage, None if unknown.
+    """
+
+    __slots__ = ('_index', '_blocks', '_error', '_traceback', '_worker', '_memory')
+
+    def __init__(self, index: int, blocks: Dict[str, Any] = None, error: str = None, traceback: str = None,
+                 worker: int = None, memory: Dict[str, int] = None):
+        """
+        Initialize BatchResult object.
+
+        :param index: Position of the document in the batch.
+        :param blocks: Retrieved contact data blocks.
+        :param error: Representation of the raised exception.
+        :param traceback: Formatted traceback of the raised exception.
+        :param worker: Process id of the worker.
+        :param memory: Resident, proportional, shared and private memory of the worker in bytes.
+        """
+
+        self._index: int = index
+        self._blocks: Dict[str, Any] = blocks
+        self._error: str = error
+        self._traceback: str = traceback
+        self._worker: int = worker
+        self._memory: Dict[str, int] = memory
+
+    def __getstate__(self) -> Tuple[Any, ...]:
+        return self.index, self.blocks, self.error, self.traceback, self.worker, self.memory
+
+    def __setstate__(self, state: Tuple[Any, ...]):
+        self.__init__(*state)
+
+    @property
+    def index(self) -> int:
+        return self._index
+
+    @property
+    def blocks(self) -> Dict[str, Any]:
+        return self._blocks
+
+    @property
+    def error(self) -> str:
+        return self._error
+
+    @property
+    def traceback(self) -> str:
+        return self._traceback
+
+    @property
+    def worker(self) -> int:
+        return self._worker
+
+    @property
+    def memory(self) -> Dict[str, int]:
+        return self._memory
+
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None
+
+    def __str__(self):
+        return f'<BatchResult of {self.index}: {"succeeded" if self.succeeded else self.error}>'
+
+
+def preload(filters: List[str], settings: Dict[str, Dict[str, Any]] = None):
+    """
+    Load everything the selected filters need ahead of time: the named entity recognition models, the libpostal
+    parser and the metadata of all regions known to phonenumbers.
+
+    :param filters: Names of the filters.
+    :param settings: Country specific settings as passed to ContactDataRetrieval.
+    """
+
+    ContactDataRetrieval.preload(filters, settings)
+
+    if 'locations' in filters:
+        # libpostal loads its model on the first parsed address
+        parse_address('warm up')
+
+    if 'phone_numbers' in filters:
+        PhoneMetadata.load_all()
+
+
+def memory_usage() -> Dict[str, int]:
+    """
+    Read the memory of the current process from /proc/self/smaps_rollup. Pages inherited copy-on-write from the parent
+    count as shared until they are written to, even if they are anonymous. The proportional set size divides every page
+    by the count of processes mapping it, so that it is the share of a worker and the sum over all processes doesn't
+    count shared pages twice.
+
+    :return: Resident set size as rss, proportional set size as pss, shared and private memory in bytes, None if
+        /proc/self/smaps_rollup isn't available.
+    """
+
+    fields: Dict[str, int] = {}
+
+    try:
+        with open('/proc/self/smaps_rollup', 'r') as smaps_rollup:
+            for line in smaps_rollup:
+                name, _, value = line.partition(':')
+
+                if value.strip().endswith(' kB'):
+                    fields[name] = int(value.split()[0]) * 1024
+    except OSError:
+        return None
+
+    return {'rss': fields['Rss'], 'pss': fields['Pss'], 'shared': fields['Shared_Clean'] + fields['Shared_Dirty'],
+            'private': fields['Private_Clean'] + fields['Private_Dirty']}
+
+
+def _initialize(filters: List[str], settings: Dict[str, Dict[str, Any]], ner_cache: PersistentCache,
+                lines_cache: PersistentCache, preloaded: bool, threads: int):
+    """
+    Prepare a worker process once: remember the batch configuration, restore the caches, load the models unless they
+    were inherited from the parent and limit the intra-op threads of torch.
+
+    :param filters: Names of the filters.
+    :param settings: Country specific settings as passed to ContactDataRetrieval.
+    :param ner_cache: Cache of the recognized entities.
+    :param lines_cache: Cache of the relevant lines.
+    :param preloaded: Whether the models were preloaded by the parent process.
+    :param threads: Number of intra-op threads of torch.
+    """
+
+    global _filters, _settings
+
+    _filters, _settings = filters, settings
+    NERExtractingTask.cache = ner_cache
+    ContactDataRetrieval.lines_cache = lines_cache
+    torch.set_num_threads(threads)
+
+    if not preloaded:
+        preload(filters, settings)
+
+
+def _process(item: Tuple[int, ContactData]) -> BatchResult:
+    """
+    Retrieve the contact data blocks of one document and capture any error, so that it doesn't end the batch.
+
+    :param item: Position of the document in the batch and its contact data.
+    :return: Outcome of the retrieval.
+    """
+
+    index, contact_data = item
+
+    try:
+        blocks: Dict[str, Any] = ContactDataRetrieval(contact_data=contact_data, filters=_filters,
+                                                      settings=_settings).blocks()
+    except Exception as error:
+        return BatchResult(index, error=repr(error), traceback=traceback.format_exc(), worker=os.getpid(),
+                           memory=memory_usage())
+
+    return BatchResult(index, blocks=blocks, worker=os.getpid(), memory=memory_usage())
+
+
+def process_many(contact_data: Iterable[ContactData], filters: List[str], workers: int = None,
+                 settings: Dict[str, Dict[str, Any]] = None, ordered: bool = True, chunk_size: int = 1,
+                 preload_in_parent: bool = False) -> Iterator[BatchResult]:
+    """
+    Retrieve the contact data blocks of many documents in a pool of worker processes. The documents are consumed
+    lazily, so that the iterable may be a streaming DataLoader.
+
+    By default every worker loads the models once at startup. If the models are preloaded in the parent instead, the
+    workers are forked afterwards and share the pages of the models copy-on-write. The objects loaded so far are frozen
+    beforehand, so that the garbage collector of a worker doesn't touch and thereby copy their pages. Either way the
+    CPUs are divided between the intra-op threads of the workers to avoid oversubscription.
+
+    :raise ValueError: If the models should be preloaded in the parent, but processes can't be forked.
+    :param contact_data: Contact data of all documents.
+    :param filters: Names of the filters.
+    :param workers: Number of worker processes, the number of CPUs by default.
+    :param settings: Country specific settings as passed to ContactDataRetrieval.
+    :param ordered: Whether the results are yielded in input order instead of as soon as they are completed.
+    :param chunk_size: Number of documents sent to a worker at once.
+    :param preload_in_parent: Whether the models are preloaded in the parent and shared with forked workers.
+    :return: Outcome of the retrieval for one document at a time.
+    """
+
+    workers = workers if workers is not None else os.cpu_count()
+    threads: int = max(1, os.cpu_count() // workers)
+    context: multiprocessing.context.BaseContext = multiprocessing.get_context()
+
+    if preload_in_parent:
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise ValueError('Preloading in the parent requires processes to be forked!')
+
+        context = multiprocessing.get_context('fork')
+        preload(filters, settings)
+        gc.collect()
+        gc.freeze()
+
+    initial_arguments: Tuple[Any, ...] = (filters, settings, NERExtractingTask.cache, ContactDataRetrieval.lines_cache,
+                                          preload_in_parent, threads)
+
+    try:
+        with context.Pool(workers, initializer=_initialize, initargs=initial_arguments) as pool:
+            results: Iterator[BatchResult] = (pool.imap if ordered else pool.imap_unordered)(
+                _process, enumerate(contact_data), chunk_size)
+
+            yield from results
+    finally:
+        if preload_in_parent:
+            gc.unfreeze()
+
+
+if __name__ == '__main__':
+    from data_loader import DataLoader
+
+    dl = DataLoader('data/imprints_plausible_v2.json', lazy=True, inference_only=True)
+    memory: Dict[int, Dict[str, int]] = {}
+
+    for result in process_many(dl, filters=['e_mails', 'human_names', 'locations', 'phone_numbers', 'organizations',
+                                            'vat_numbers'], ordered=False, preload_in_parent=True):
+        print(result if result.succeeded else result.traceback)
+
+        if result.memory is not None:
+            memory[result.worker] = result.memory
+
+    for worker, usage in memory.items():
+        print(f'worker {worker}: ' + ', '.join(f'{usage[field] / 2 ** 20:.1f} MiB {field}'
+                                               for field in ('pss', 'rss', 'shared', 'private')))
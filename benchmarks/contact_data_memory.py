@@ -0,0 +1,74 @@
+import sys
+import tracemalloc
+
+from typing import Any, Callable, Dict, List
+
+from contact_data import ContactData
+from data_loader import DataLoader
+from indexed_data_loader import IndexedDataLoader
+
+
+class DictContactData:
+    """
+    Contact data with an instance dictionary and eagerly decoded fields as before the slotted layout, for comparison.
+    """
+
+    def __init__(self, data: Dict[str, Any]):
+        self._country_code: str = data['country_code']
+        self._raw_input: str = data['raw_input']
+        self._fixed_input: str = data['fixed_input']
+        self._crawled_imprint: str = data['crawled_imprint']
+        self._crawled_website: str = data['crawled_website']
+        self._line_annotations: List[Dict[str, Any]] = data['line_annotations']
+        self._expected_contact_data: Dict[str, Any] = data['expected_contact_data']
+        self._token_annotations: List[Dict[str, str]] = data['token_annotations']
+
+
+def object_size(contact_data: Any) -> int:
+    """
+    Measure the size of a contact data object itself without the fields it refers to.
+
+    :param contact_data: Contact data object.
+    :return: Bytes of the object and its instance dictionary.
+    """
+
+    return sys.getsizeof(contact_data) + (sys.getsizeof(vars(contact_data)) if hasattr(contact_data, '__dict__') else 0)
+
+
+def measure(load: Callable[[], List[Any]]) -> float:
+    """
+    Measure the memory retained by a whole corpus of contact data objects.
+
+    :param load: Loading strategy.
+    :return: MiB retained after loading.
+    """
+
+    tracemalloc.start()
+    corpus: List[Any] = load()
+    retained: int = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del corpus
+
+    return retained / 2 ** 20
+
+
+if __name__ == '__main__':
+    source: str = '../data/imprints_plausible_v2.json'
+    records: str = '../data/imprints_plausible_v2.records'
+    idl = IndexedDataLoader.convert(source=source, path=records)
+    fields: Dict[str, Any] = DataLoader._fields(next(DataLoader(source, lazy=True)._stream_raw_data()))
+
+    print(f'per object: {object_size(DictContactData(fields))} bytes with instance dictionary, '
+          f'{object_size(ContactData(fields))} bytes slotted')
+
+    strategies: Dict[str, Callable[[], List[Any]]] = {
+        'instance dictionary': lambda: [DictContactData(DataLoader._fields(entry))
+                                        for entry in DataLoader(source, lazy=True)._stream_raw_data()],
+        'slotted': lambda: list(DataLoader(source, lazy=True)),
+        'slotted inference only': lambda: list(DataLoader(source, lazy=True, inference_only=True)),
+        'indexed lazily decoded': lambda: list(IndexedDataLoader(records)),
+        'indexed inference only': lambda: list(IndexedDataLoader(records, inference_only=True))
+    }
+
+    for name, strategy in strategies.items():
+        print(f'{name}: {measure(strategy):.1f} MiB for the whole corpus')
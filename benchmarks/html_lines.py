@@ -0,0 +1,43 @@
+import time
+
+from typing import Callable, List
+
+from data_loader import DataLoader
+from pre_processing import PreProcessing
+
+
+def measure(documents: List[PreProcessing], convert: Callable[[PreProcessing], List[str]]) -> float:
+    """
+    Measure the time to convert the html content of all documents into lines.
+
+    :param documents: Pre-processing objects of all documents.
+    :param convert: Conversion strategy.
+    :return: Seconds for all documents.
+    """
+
+    start: float = time.perf_counter()
+
+    for document in documents:
+        convert(document)
+
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    dl = DataLoader('../data/imprints_plausible_v2.json')
+    corpus: List[PreProcessing] = [PreProcessing(contact_data=contact_data) for contact_data in dl.cleansed_data]
+    megabytes: float = sum(len(document.contact_data.raw_input.encode('utf-8')) for document in corpus) / 2 ** 20
+
+    def beautiful_soup(document: PreProcessing) -> List[str]:
+        return document.remove_blank_lines().split('\n')
+
+    def streaming(document: PreProcessing) -> List[str]:
+        return document.split_lines()
+
+    differing: int = sum(beautiful_soup(document) != streaming(document) for document in corpus)
+
+    for name, strategy in (('beautiful soup', beautiful_soup), ('streaming', streaming)):
+        seconds: float = measure(corpus, strategy)
+        print(f'{name}: {len(corpus) / seconds:.1f} documents/sec, {megabytes / seconds:.2f} MiB/sec')
+
+    print(f'{differing} of {len(corpus)} documents differ')
@@ -0,0 +1,55 @@
+import time
+
+from typing import Dict, List
+
+from data_loader import DataLoader
+from extractors.human_name_extractor import HumanNameExtractor
+from extractors.ner_pipelines import NamedEntityRecognizer
+from pre_processing import PreProcessing
+
+BATCH_SIZES = (1, 4, 8, 16, 32, 64)
+
+
+def corpus_lines(data_loader: DataLoader, documents: int) -> Dict[int, str]:
+    """
+    Collect the lines of the first documents of the corpus.
+
+    :param data_loader: Loader of the contact data corpus.
+    :param documents: Number of documents.
+    :return: Lines of all documents with consecutive indices.
+    """
+
+    lines: List[str] = []
+
+    for index in range(documents):
+        lines += PreProcessing(contact_data=data_loader.contact_data(index=index)).split_lines()
+
+    return {index: line for index, line in enumerate(lines)}
+
+
+def lines_per_second(lines: Dict[int, str], batch_size: int) -> float:
+    """
+    Measure the CPU throughput of the NER stage for a batch size.
+
+    :param lines: Lines to recognize.
+    :param batch_size: Number of lines per forward pass.
+    :return: Recognized lines per second.
+    """
+
+    recognizer: NamedEntityRecognizer = HumanNameExtractor.recognizer(batch_size=batch_size, cache=None)
+    start: float = time.perf_counter()
+    recognizer(lines)
+
+    return len(lines) / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    dl = DataLoader('../data/imprints_plausible_v2.json')
+    benchmark_lines = corpus_lines(data_loader=dl, documents=10)
+
+    # Warm up the model before measuring
+    HumanNameExtractor.preload()
+    lines_per_second(dict(list(benchmark_lines.items())[:16]), 16)
+
+    for size in BATCH_SIZES:
+        print(f'batch size {size}: {lines_per_second(benchmark_lines, size):.1f} lines/sec')
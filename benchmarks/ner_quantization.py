@@ -0,0 +1,85 @@
+import time
+
+from typing import Any, Dict, List, Set, Tuple
+
+from data_loader import DataLoader
+from extractors.human_name_extractor import HumanNameExtractor
+from extractors.ner_pipelines import NERModelRegistry, NamedEntityRecognizer
+
+
+def annotated_lines(data_loader: DataLoader, languages: Tuple[str, ...]) -> Dict[int, str]:
+    """
+    Collect the annotated lines of the corpus.
+
+    :param data_loader: Loader of the contact data corpus.
+    :param languages: Languages that should be taken into account.
+    :return: Annotated lines with consecutive indices.
+    """
+
+    lines: List[str] = []
+
+    for contact_data in data_loader.cleansed_data:
+        if contact_data.line_annotations and contact_data.country_code in languages:
+            lines += [line['text'] for line in contact_data.line_annotations if 'text' in line]
+
+    return {index: line for index, line in enumerate(lines)}
+
+
+def recognize(lines: Dict[int, str], backend: str) -> Tuple[Dict[int, List[Dict[str, Any]]], float]:
+    """
+    Recognize the entities of all lines with a backend.
+
+    :param lines: Lines to recognize.
+    :param backend: Inference backend, either fp32 or quantized.
+    :return: Recognized entities and seconds per line.
+    """
+
+    recognizer: NamedEntityRecognizer = HumanNameExtractor.recognizer(backend=backend, cache=None)
+
+    # Load the model before measuring
+    recognizer.pipeline
+
+    start: float = time.perf_counter()
+    recognized: Dict[int, List[Dict[str, Any]]] = recognizer(lines)
+
+    return recognized, (time.perf_counter() - start) / len(lines)
+
+
+def agreement(reference: Dict[int, List[Dict[str, Any]]], candidate: Dict[int, List[Dict[str, Any]]]) -> Dict[str, float]:
+    """
+    Calculate precision, recall and f1 score of the candidate entities against the reference entities.
+
+    :param reference: Entities of the fp32 model.
+    :param candidate: Entities of the compared model.
+    :return: Precision, recall and f1 score.
+    """
+
+    expected: Set[Tuple[int, str, str]] = {(line_index, entity['entity_group'], entity['word'])
+                                           for line_index, entities in reference.items() for entity in entities}
+    predicted: Set[Tuple[int, str, str]] = {(line_index, entity['entity_group'], entity['word'])
+                                            for line_index, entities in candidate.items() for entity in entities}
+    true_positives: int = len(expected & predicted)
+    precision: float = true_positives / len(predicted) if predicted else 1.0
+    recall: float = true_positives / len(expected) if expected else 1.0
+
+    return {
+        'precision': precision,
+        'recall': recall,
+        'f1': 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    }
+
+
+if __name__ == '__main__':
+    dl = DataLoader('../data/imprints_plausible_v2.json')
+    benchmark_lines = annotated_lines(data_loader=dl, languages=('DE',))
+
+    fp32, fp32_latency = recognize(benchmark_lines, 'fp32')
+    quantized, quantized_latency = recognize(benchmark_lines, 'quantized')
+
+    print(f'lines: {len(benchmark_lines)}')
+    print(f'fp32: {fp32_latency * 1000:.2f} ms/line')
+    print(f'quantized: {quantized_latency * 1000:.2f} ms/line ({fp32_latency / quantized_latency:.2f}x)')
+    print(f'quantized vs fp32: {agreement(fp32, quantized)}')
+
+    for key, size in NERModelRegistry.memory_usage().items():
+        print(f'{key[3]}: {size / 2 ** 20:.0f} MiB')
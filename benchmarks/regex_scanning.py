@@ -0,0 +1,56 @@
+import time
+
+from typing import Callable, Dict, List, Type
+
+from data_loader import DataLoader
+from entity import Entity
+from extractors.e_mail_address_extractor import EMailAddressExtractor
+from extractors.extracting_tasks import RegExExtractingTask
+from extractors.regex_scanner import RegExScanner
+from extractors.url_extractor import URLExtractor
+from extractors.vat_number_extractor import VATNumberExtractor
+from pre_processing import PreProcessing
+
+TASKS = [EMailAddressExtractor, URLExtractor, VATNumberExtractor]
+
+
+def per_line(lines: Dict[int, str]) -> Dict[Type[RegExExtractingTask], List[Entity]]:
+    return {task: task(lines).extracted for task in TASKS}
+
+
+def combined(lines: Dict[int, str]) -> Dict[Type[RegExExtractingTask], List[Entity]]:
+    return RegExScanner.of(TASKS).scan(lines)
+
+
+def document_level(lines: Dict[int, str]) -> Dict[Type[RegExExtractingTask], List[Entity]]:
+    return RegExScanner.of(TASKS, document_level=True).scan(lines)
+
+
+def measure(documents: List[Dict[int, str]],
+            scan: Callable[[Dict[int, str]], Dict[Type[RegExExtractingTask], List[Entity]]]) -> float:
+    """
+    Measure the time to scan all documents.
+
+    :param documents: Lines of every document.
+    :param scan: Scanning strategy.
+    :return: Seconds for all documents.
+    """
+
+    start: float = time.perf_counter()
+
+    for lines in documents:
+        scan(lines)
+
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    dl = DataLoader('../data/imprints_plausible_v2.json')
+    corpus: List[Dict[int, str]] = [dict(enumerate(PreProcessing(contact_data=contact_data).split_lines()))
+                                    for contact_data in dl.cleansed_data]
+    baseline: float = measure(corpus, per_line)
+
+    for name, strategy in (('per line', per_line), ('combined', combined), ('document level', document_level)):
+        differing: int = sum(strategy(lines) != per_line(lines) for lines in corpus)
+        seconds: float = measure(corpus, strategy)
+        print(f'{name}: {seconds:.3f}s ({baseline / seconds:.2f}x), {differing} documents differ from per line')
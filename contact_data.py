@@ -1,10 +1,16 @@
-from typing import Dict, List, Any
+import json
+
+from typing import Dict, List, Any, Union
 
 
 class ContactData:
     """
     This is a class to save the contact data of website.
 
+    The training only fields fixed_input, line_annotations, expected_contact_data and token_annotations can be passed
+    json encoded as training_data, in which case they are decoded on first access, or left out completely for
+    inference, in which case they are None.
+
     Instance variables:
         - country_code: Code of the country.
         - raw_input: Scraped html content.
@@ -12,9 +18,14 @@ class ContactData:
         - crawled_imprint: The imprint that provides the raw_input.
         - crawled_website: The website to which the imprint belongs.
         - line_annotation: Every line with annotations.
-        -
+        - expected_contact_data: Expected contact data of the website.
+        - token_annotations: Every token with annotations.
     """
 
+    __slots__ = ('_country_code', '_raw_input', '_crawled_imprint', '_crawled_website', '_training_data')
+
+    training_fields = ('fixed_input', 'line_annotations', 'expected_contact_data', 'token_annotations')
+
     def __init__(self, data: Dict[str, Any]):
         """
         Initialize ContactData object.
@@ -24,12 +35,25 @@ class ContactData:
 
         self._country_code: str = data['country_code']
         self._raw_input: str = data['raw_input']
-        self._fixed_input: str = data['fixed_input']
         self._crawled_imprint: str = data['crawled_imprint']
         self._crawled_website: str = data['crawled_website']
-        self._line_annotations: List[Dict[str, Any]] = data['line_annotations']
-        self._expected_contact_data: Dict[str, Any] = data['expected_contact_data']
-        self._token_annotations: List[Dict[str, str]] = data['token_annotations']
+        self._training_data: Union[str, Dict[str, Any], None] = data.get('training_data')
+
+        if self._training_data is None and any(field in data for field in self.training_fields):
+            self._training_data = {field: data.get(field) for field in self.training_fields}
+
+    def _training(self, field: str) -> Any:
+        """
+        Retrieve a training only field and decode all training only fields on first access.
+
+        :param field: Name of the field.
+        :return: Content of the field, None if the training only fields were left out.
+        """
+
+        if isinstance(self._training_data, str):
+            self._training_data = json.loads(self._training_data)
+
+        return self._training_data[field] if self._training_data is not None else None
 
     @property
     def country_code(self):
@@ -40,8 +64,8 @@ class ContactData:
         return self._raw_input
 
     @property
-    def fixed_input(self):
-        return self._fixed_input
+    def fixed_input(self) -> str:
+        return self._training('fixed_input')
 
     @property
     def crawled_imprint(self):
@@ -52,16 +76,16 @@ class ContactData:
         return self._crawled_website
 
     @property
-    def line_annotations(self):
-        return self._line_annotations
+    def line_annotations(self) -> List[Dict[str, Any]]:
+        return self._training('line_annotations')
 
     @property
-    def expected_contact_data(self):
-        return self._expected_contact_data
+    def expected_contact_data(self) -> Dict[str, Any]:
+        return self._training('expected_contact_data')
 
     @property
-    def token_annotations(self):
-        return self._token_annotations
+    def token_annotations(self) -> List[Dict[str, str]]:
+        return self._training('token_annotations')
 
     def __str__(self):
         return f'<ContactData of {self.crawled_website}>'
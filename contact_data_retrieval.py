@@ -1,11 +1,15 @@
+import heapq
+import inspect
 import json
 import operator
+import os
 import re
 import tldextract
 
+from concurrent.futures import Future, ThreadPoolExecutor
 from itertools import combinations
 from difflib import SequenceMatcher
-from typing import List, Type, Dict, Any
+from typing import List, Type, Dict, Any, Tuple, Callable, Iterable, Iterator
 from genderize import Genderize
 from fuzzywuzzy.fuzz import token_set_ratio
 from pgeocode import Nominatim
@@ -14,19 +18,27 @@ from cleanco import prepare_terms, basename
 
 from contact_data import ContactData
 from data_loader import DataLoader
+from entity import Entity, EntityType
 from extractors.e_mail_address_extractor import EMailAddressExtractor
-from extractors.extracting_tasks import ExtractingTask
+from extractors.extracting_tasks import ExtractingTask, NERExtractingTask, RegExExtractingTask
 from extractors.human_name_extractor import HumanNameExtractor
 from extractors.location_extractor import LocationExtractor
+from extractors.ner_pipelines import NERModelRegistry, NamedEntityRecognizer
 from extractors.organization_extractor import OrganizationExtractor
 from extractors.phone_number_extractor import PhoneNumberExtractor
+from extractors.regex_scanner import RegExScanner
 from extractors.url_extractor import URLExtractor
 from extractors.vat_number_extractor import VATNumberExtractor
-from pre_processing import PreProcessing
+from keyword_matcher import KeywordMatcher
+from persistent_cache import PersistentCache
+from pre_processing import PreProcessing, HTMLLineParser
 
 
 class ContactDataRetrieval(PreProcessing):
     _similarity_cutoff = 70
+    _document_level_scanning = True
+    _concurrent_stages = True
+    _deduplicate_lines = True
 
     _filter_mappings = {
         'e_mails': EMailAddressExtractor,
@@ -52,11 +64,86 @@ class ContactDataRetrieval(PreProcessing):
         'com', 'org', 'de', 'edu', 'info'
     ]
 
-    def __init__(self, contact_data: ContactData, filters: List[str] = None):
+    lines_cache: PersistentCache = None
+    debug_directory: str = None
+    _preprocessing_versions: Dict[Type['ContactDataRetrieval'], str] = {}
+
+    def __init__(self, contact_data: ContactData, filters: List[str] = None,
+                 settings: Dict[str, Dict[str, Any]] = None,
+                 recognize: Callable[[NamedEntityRecognizer, Dict[int, str]], Dict[int, List[Dict[str, Any]]]] = None):
         # Initialize superclass
         super().__init__(contact_data=contact_data)
 
         # Initialize instance variables
+        relevant_lines: Dict[int, str] = self._relevant_lines()
+
+        print('relevant lines:')
+        for line_index, line in relevant_lines.items():
+            print(f'{line_index}: {line}')
+
+        self._lines = relevant_lines
+        # Country specific settings keyed by country code in the format of language_settings.DICTIONARIES
+        self._settings: Dict[str, Dict[str, Any]] = settings if settings is not None else {}
+        # Recognizes the entities of the lines with a recognizer, e.g. batched with the lines of other documents
+        self._recognize: Callable[[NamedEntityRecognizer, Dict[int, str]], Dict[int, List[Dict[str, Any]]]] = \
+            recognize if recognize is not None else lambda recognizer, lines: recognizer(lines)
+        self._filters: List[Type[ExtractingTask]] = self._prepare_filters(filters)
+        self._save_blocks(self._pipeline())
+
+    @classmethod
+    def preload(cls, filters: List[str], settings: Dict[str, Dict[str, Any]] = None):
+        """
+        Load the models of all selected named entity recognition filters ahead of time, e.g. at process startup.
+
+        Every country may select its own model and backend, so the models of all countries are loaded. Countries
+        without settings use the default model, which is only loaded ahead of time if no country has settings.
+
+        :param filters: Names of the filters.
+        :param settings: Country specific settings as passed to the constructor.
+        """
+
+        settings = settings if settings is not None else {}
+        ner_settings: List[Dict[str, Any]] = [country_settings.get('named_entity_recognition', {})
+                                              for country_settings in settings.values()] or [{}]
+
+        for _filter in dict.fromkeys(cls._filter_mappings[_filter] for _filter in filters):
+            if _filter is not None and issubclass(_filter, NERExtractingTask):
+                for options in ner_settings:
+                    _filter.preload(**options)
+
+    @classmethod
+    def preprocessing_version(cls) -> str:
+        """
+        Calculate the version of the pre-processing from the source of all code and terms the relevant lines depend
+        on, so that cached lines are invalidated automatically whenever one of them changes.
+
+        :return: Version of the pre-processing.
+        """
+
+        if cls not in cls._preprocessing_versions:
+            cls._preprocessing_versions[cls] = PersistentCache.key(
+                inspect.getsource(PreProcessing), inspect.getsource(HTMLLineParser), inspect.getsource(KeywordMatcher),
+                inspect.getsource(cls._relevant_lines), repr(cls._irrelevant_lines))
+
+        return cls._preprocessing_versions[cls]
+
+    def _relevant_lines(self) -> Dict[int, str]:
+        """
+        Split the html content into lines and drop the irrelevant ones. The lines are taken from the lines cache if
+        the same raw input has already been pre-processed by the same version of the pre-processing.
+
+        :return: Relevant lines.
+        """
+
+        key: str = None
+
+        if self.lines_cache is not None:
+            key = self.lines_cache.key(self.preprocessing_version(), self.contact_data.raw_input)
+            cached: Dict[str, List[List[Any]]] = self.lines_cache.get_many([key])
+
+            if key in cached:
+                return {line_index: line for line_index, line in cached[key]}
+
         lines: Dict[int, str] = {index: line.replace(u'\xa0', u' ') for index, line in enumerate(self.split_lines())}
 
         print('lines:')
@@ -64,26 +151,16 @@ class ContactDataRetrieval(PreProcessing):
             print(f'{line_index}: {line}')
 
         relevant_lines: Dict[int, str] = {}
+        irrelevant_lines: KeywordMatcher = KeywordMatcher.of(self._irrelevant_lines)
 
         for line_index, line in lines.items():
-            relevant_flag = True
-
-            for irrelevant in self._irrelevant_lines:
-                print(line)
-                print(irrelevant in line.lower())
-                if irrelevant in line.lower():
-                    relevant_flag = False
-
-            if relevant_flag:
+            if not irrelevant_lines.occurs_in(line.lower()):
                 relevant_lines[line_index] = line
 
-        print('relevant lines:')
-        for line_index, line in relevant_lines.items():
-            print(f'{line_index}: {line}')
+        if self.lines_cache is not None:
+            self.lines_cache.set_many({key: list(relevant_lines.items())})
 
-        self._lines = relevant_lines
-        self._filters: List[Type[ExtractingTask]] = self._prepare_filters(filters)
-        self._save_blocks(self._pipeline())
+        return relevant_lines
 
     def __str__(self):
         pass
@@ -91,11 +168,11 @@ class ContactDataRetrieval(PreProcessing):
     def __repr__(self):
         pass
 
-    def _main_organisation(self, entities: List[Dict[str, Any]]):
+    def _main_organisation(self, entities: List[Entity]):
         #TODO: Maybe use basename for comparison, but need to combine with business type again
         umlauts = {'ä': 'ae', 'Ä': 'Ae', 'ö': 'oe', 'Ö': 'Oe', 'ü': 'ue', 'Ü': 'Ue', 'ß': 'ss'}
 
-        organizations: List[str] = [entity['match'] for entity in entities if entity['type'] == 'organization']
+        organizations: List[str] = [entity.match for entity in entities if entity.type is EntityType.ORGANIZATION]
         cleaned: List[str] = []
 
         for organization in organizations:
@@ -149,62 +226,161 @@ class ContactDataRetrieval(PreProcessing):
     def _prepare_filters(self, filters: List[str]) -> List[Type[ExtractingTask]]:
         _filters: List[Type[ExtractingTask]] = []
 
-        for _filter in filters:
+        # Every filter runs only once, even if it is selected repeatedly
+        for _filter in dict.fromkeys(filters):
             _filters.append(self._filter_mappings[_filter])
 
         return _filters
 
-    def _pipeline(self):
-        _matches: List[Dict[str, Any]] = []
-
-        for _filter in self.filters:
-            if issubclass(_filter, PhoneNumberExtractor):
-                _matches = _matches + _filter(lines=self.lines, country_code=self.contact_data.country_code).extracted
+    def _pipeline(self) -> Iterator[Entity]:
+        """
+        Run the filters as concurrent stages on a thread pool, so that the regex, phone number and libpostal work
+        overlaps with the named entity recognition, which releases the GIL. Every NER model and the combined regex scan
+        run only once and are submitted first, so that the extractors waiting for them never block their progress. The
+        matches are merged in the order of the filters regardless of which stage finishes first.
+
+        Every filter yields its matches in line order, so they are merged into one stream in line order by a k-way merge
+        instead of concatenating and sorting them. The merge is stable, so the matches of a line keep the order of the
+        filters and their order within a filter.
+
+        Context free filters see every distinct line text only once and their matches are copied to all lines with the
+        same text afterwards, so that repeated blocks of a page are extracted only once.
+
+        :return: Matches of all filters in line order.
+        """
+
+        unique_lines, copies = self._unique_lines()
+        recognizers: Dict[Type[NERExtractingTask], NamedEntityRecognizer] = {
+            _filter: _filter.recognizer(**self.country_settings.get('named_entity_recognition', {}))
+            for _filter in self.filters if issubclass(_filter, NERExtractingTask)}
+        regex_filters: List[Type[RegExExtractingTask]] = [_filter for _filter in self.filters
+                                                          if issubclass(_filter, RegExExtractingTask)]
+        # Filters sharing a recognition or a scan must see the same lines
+        ner_lines: Dict[int, str] = unique_lines if all(_filter.context_free for _filter in recognizers) else self.lines
+        regex_lines: Dict[int, str] = unique_lines if all(_filter.context_free for _filter in regex_filters) \
+            else self.lines
+        stages: int = len({recognizer.key for recognizer in recognizers.values()}) + 1 + len(self.filters)
+
+        with ThreadPoolExecutor(max_workers=stages if self._concurrent_stages else 1) as executor:
+            # Run every NER model only once per document and share its entities between the extractors
+            recognized: Dict[Tuple[Any, ...], Future] = {}
+
+            for recognizer in recognizers.values():
+                if recognizer.key not in recognized:
+                    recognized[recognizer.key] = executor.submit(self._recognize, recognizer, ner_lines)
+
+            # Scan the lines once for the patterns of all selected regex extractors
+            scanned: Future = executor.submit(RegExScanner.of(regex_filters,
+                                                              document_level=self._document_level_scanning).scan,
+                                              regex_lines) if regex_filters else None
+
+            extracted: List[Future] = []
+
+            for _filter in self.filters:
+                lines: Dict[int, str] = ner_lines if _filter in recognizers else \
+                    regex_lines if _filter in regex_filters else unique_lines if _filter.context_free else self.lines
+                extracted.append(executor.submit(
+                    self._extract, _filter, lines, copies if lines is not self.lines else None,
+                    recognized[recognizers[_filter].key] if _filter in recognizers else None, scanned))
+
+            return heapq.merge(*(extraction.result() for extraction in extracted), key=operator.attrgetter('index'))
+
+    def _unique_lines(self) -> Tuple[Dict[int, str], Dict[int, List[int]]]:
+        """
+        Collapse lines with identical text to their first occurrence.
+
+        :return: First line of every distinct text and the indices of all lines with the text of every first line.
+        """
+
+        first_indices: Dict[str, int] = {}
+        copies: Dict[int, List[int]] = {}
+
+        for line_index, line in self.lines.items():
+            if not self._deduplicate_lines or line not in first_indices:
+                first_indices.setdefault(line, line_index)
+                copies[line_index] = [line_index]
             else:
-                _matches = _matches + _filter(lines=self.lines).extracted
+                copies[first_indices[line]].append(line_index)
+
+        if len(copies) == len(self.lines):
+            return self.lines, None
+
+        return {line_index: self.lines[line_index] for line_index in copies}, copies
+
+    def _extract(self, _filter: Type[ExtractingTask], lines: Dict[int, str], copies: Dict[int, List[int]],
+                 recognized: Future, scanned: Future) -> Iterable[Entity]:
+        """
+        Run one filter on the lines and copy its matches to the lines with the same text.
 
-        return _matches
+        :param _filter: The filter.
+        :param lines: Lines to extract from, either all lines or the first line of every distinct text.
+        :param copies: Indices of all lines with the text of every first line, None if lines are all lines.
+        :param recognized: Pending entities of the NER model of the filter, if it is a NER filter.
+        :param scanned: Pending matches of all regex filters, if it is a regex filter.
+        :return: Matches of the filter in line order.
+        """
 
-    def _save_blocks(self, *args):
-        assorted: List[Dict[str, Any]] = sorted(args[0], key=lambda k: k['index'])
+        if issubclass(_filter, PhoneNumberExtractor):
+            matches: Iterable[Entity] = _filter(lines=lines, country_code=self.contact_data.country_code)
+        elif issubclass(_filter, NERExtractingTask):
+            matches: Iterable[Entity] = _filter(lines=lines, entities=recognized.result())
+        elif issubclass(_filter, RegExExtractingTask):
+            matches: Iterable[Entity] = scanned.result()[_filter]
+        else:
+            matches: Iterable[Entity] = _filter(lines=lines)
 
-        with open('test8.json', 'w') as file:
-            json.dump(assorted, file)
+        if copies is None:
+            return matches
 
-        with open('test8.json', 'r') as file:
-            lines = json.load(file)
+        # The sort is stable, so the matches of every line keep their order
+        return sorted((match.with_index(line_index) for match in matches for line_index in copies[match.index]),
+                      key=operator.attrgetter('index'))
 
-    def _relevant(self) -> List[Dict[str, Any]]:
-        # TODO: accept lines from pipeline
+    def _save_blocks(self, entities: Iterable[Entity]):
+        self._entities: List[Entity] = list(entities)
 
-        with open('test8.json', 'r') as file:
-            entities = json.load(file)
+        if self.debug_directory is not None:
+            self._dump_entities()
+
+    def _dump_entities(self):
+        """
+        Write the entities into the debug directory. The file is named after the website and the hash of the raw input,
+        so that documents processed concurrently never share a file.
+        """
+
+        website: str = re.sub(r'[^\w.-]+', '_', self.contact_data.crawled_website or '')
+        digest: str = PersistentCache.key(self.contact_data.raw_input)[:16]
+        os.makedirs(self.debug_directory, exist_ok=True)
+
+        with open(os.path.join(self.debug_directory, f'{website}_{digest}.json'), 'w') as file:
+            json.dump([entity.to_dict() for entity in self.entities], file)
+
+    def _relevant(self) -> List[Entity]:
+        entities: List[Entity] = self.entities
 
         print('entities')
         for entity in entities:
             print(entity)
 
-        relevant: List[Dict[str, Any]] = []
+        relevant: List[Entity] = []
+        irrelevant_entities: KeywordMatcher = KeywordMatcher.of(self._irrelevant_entities)
+        top_level_domains: KeywordMatcher = KeywordMatcher.of(self._top_level_domains)
 
         for entity in entities:
-            relevant_flag: bool = True
+            match: str = entity.match.lower()
 
-            for irrelevant in self._irrelevant_entities:
-                if irrelevant in entity['match'].lower():
-                    relevant_flag = False
+            if irrelevant_entities.occurs_in(match):
+                continue
 
-            for irrelevant in self._top_level_domains:
-                if entity['type'] == 'organization':
-                    if irrelevant in entity['match'].lower():
-                        relevant_flag = False
+            if entity.type is EntityType.ORGANIZATION and top_level_domains.occurs_in(match):
+                continue
 
-            if relevant_flag:
-                relevant.append(entity)
+            relevant.append(entity)
 
         return relevant
 
     def blocks(self):
-        relevant: List[Dict[str, Any]] = self._relevant()
+        relevant: List[Entity] = self._relevant()
 
         print('relevant')
         for element in relevant:
@@ -259,43 +435,43 @@ class ContactDataRetrieval(PreProcessing):
             print(entity)
             if misleading_flag:
                 print(1)
-                if entity['type'] != 'organization':
+                if entity.type is not EntityType.ORGANIZATION:
                     print(2)
-                    blocks['misleading'].append(entity)
+                    blocks['misleading'].append(entity.to_dict())
                 else:
                     print(3)
-                    if token_set_ratio(main_organization_base_name, basename(entity['match'], terms, prefix=False, middle=False, suffix=True)) > self._similarity_cutoff:
+                    if token_set_ratio(main_organization_base_name, basename(entity.match, terms, prefix=False, middle=False, suffix=True)) > self._similarity_cutoff:
                         print(4)
                         misleading_flag = False
-                        blocks['secondary'].append(entity)
+                        blocks['secondary'].append(entity.to_dict())
                     else:
                         print(6)
-                        blocks['misleading'].append(entity)
+                        blocks['misleading'].append(entity.to_dict())
             else:
                 print(7)
-                if entity['type'] == 'organization':
+                if entity.type is EntityType.ORGANIZATION:
                     print(8)
-                    if token_set_ratio(main_organization_base_name, basename(entity['match'], terms, prefix=False, middle=False, suffix=True)) < self._similarity_cutoff:
+                    if token_set_ratio(main_organization_base_name, basename(entity.match, terms, prefix=False, middle=False, suffix=True)) < self._similarity_cutoff:
                         print(9)
                         misleading_flag = True
-                        blocks['misleading'].append(entity)
+                        blocks['misleading'].append(entity.to_dict())
                     else:
                         print(10)
-                        blocks['secondary'].append(entity)
+                        blocks['secondary'].append(entity.to_dict())
                 else:
                     print(13)
-                    if '_' in entity['type']:
+                    if entity.type.field is not None:
                         print(14)
-                        tag = entity['type'].split('_')[0]
+                        tag = entity.type.tag
 
                         if temp['tag'] is None:
                             print(15)
                             temp['tag'] = tag
-                            temp['matches'].append(entity['match'])
+                            temp['matches'].append(entity.match)
                             temp['entities'].append(entity)
                         elif tag == temp['tag']:
                             print(16)
-                            temp['matches'].append(entity['match'])
+                            temp['matches'].append(entity.match)
                             temp['entities'].append(entity)
                         else:
                             print(17)
@@ -304,19 +480,19 @@ class ContactDataRetrieval(PreProcessing):
                                 blocks['main'][temp['tag']] = ' '.join(temp['matches'])
                             else:
                                 print(19)
-                                blocks['secondary'] += temp['entities']
+                                blocks['secondary'] += [element.to_dict() for element in temp['entities']]
 
-                            temp = {'tag': tag, 'matches': [entity['match']], 'entities': [entity]}
+                            temp = {'tag': tag, 'matches': [entity.match], 'entities': [entity]}
                     else:
                         print(20)
                         if temp['tag'] is None:
                             print(21)
-                            if not blocks['main'][entity['type']]:
+                            if not blocks['main'][entity.type.tag]:
                                 print(22)
-                                blocks['main'][entity['type']] = entity['match']
+                                blocks['main'][entity.type.tag] = entity.match
                             else:
                                 print(23)
-                                blocks['secondary'].append(entity)
+                                blocks['secondary'].append(entity.to_dict())
                         else:
                             print(24)
                             print(temp['tag'])
@@ -327,22 +503,22 @@ class ContactDataRetrieval(PreProcessing):
                                 print(25)
                                 blocks['main'][temp['tag']] = ' '.join(temp['matches'])
 
-                                if not blocks['main'][entity['type']]:
+                                if not blocks['main'][entity.type.tag]:
                                     print(26)
-                                    blocks['main'][entity['type']] = entity['match']
+                                    blocks['main'][entity.type.tag] = entity.match
                                 else:
                                     print(27)
-                                    blocks['secondary'].append(entity['match'])
+                                    blocks['secondary'].append(entity.match)
                             else:
                                 print(28)
-                                blocks['secondary'] += temp['entities']
+                                blocks['secondary'] += [element.to_dict() for element in temp['entities']]
 
-                                if not blocks['main'][entity['type']]:
+                                if not blocks['main'][entity.type.tag]:
                                     print(26)
-                                    blocks['main'][entity['type']] = entity['match']
+                                    blocks['main'][entity.type.tag] = entity.match
                                 else:
                                     print(27)
-                                    blocks['secondary'].append(entity['match'])
+                                    blocks['secondary'].append(entity.match)
 
                             temp = {'tag': None, 'matches': [], 'entities': []}
 
@@ -368,6 +544,8 @@ class ContactDataRetrieval(PreProcessing):
             else:
                 print(f'"{key}": "{value}"')
 
+        return blocks
+
     def _contact_data(self):
         pass
 
@@ -392,14 +570,31 @@ class ContactDataRetrieval(PreProcessing):
     def filters(self):
         return self._filters
 
+    @property
+    def settings(self):
+        return self._settings
+
+    @property
+    def country_settings(self) -> Dict[str, Any]:
+        return self.settings.get(self.contact_data.country_code, {})
+
+    @property
+    def entities(self):
+        return self._entities
+
 
 if __name__ == '__main__':
     # test = 1200, test1 = 1481, test2 = 876, test3 = 538, test4 = 564, test5 = 187, test6 = 231, test7 = 347, test8 = 1862
     dl = DataLoader('data/imprints_plausible_v2.json')
+    HumanNameExtractor.preload()
+    print(NERModelRegistry.memory_usage())
+    NERExtractingTask.cache = PersistentCache('ner_cache.sqlite3')
+    ContactDataRetrieval.lines_cache = PersistentCache('lines_cache.sqlite3')
     print(dl.contact_data(index=1862))
     cdr = ContactDataRetrieval(contact_data=dl.contact_data(index=1862), filters=['e_mails', 'human_names', 'locations', 'phone_numbers', 'organizations', 'phone_numbers', 'vat_numbers'])
     #cdr = ContactDataRetrieval(contact_data=dl.contact_data(index=347), filters=[])
     cdr.blocks()
+    print(f'NER cache hits: {NERExtractingTask.cache.hits}, misses: {NERExtractingTask.cache.misses}')
     # TODO: for organization use probablepeople to split in name and type (e.g. cubewerk and GmbH), use only name for main organization but concatenate in final contact data
     # TODO: und teste organizations für misleading auch nur gegen den name also cubewerk GmbH und exali GmbH -> cubewerk vs exali
     # TODO: street missing at 538
\ No newline at end of file
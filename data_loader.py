@@ -1,7 +1,10 @@
 import json
 import os
+import pandas as pd
+import numpy as np
 
-from typing import List, Dict, Any, Tuple
+from itertools import islice
+from typing import List, Dict, Any, Iterator, Tuple
 
 from contact_data import ContactData
 
@@ -10,29 +13,53 @@ class DataLoader:
     """
     This is a class to load data from the contact data json file in raw and cleansed format.
 
+    In lazy mode the json file is never loaded as a whole. Instead its entries are parsed incrementally and yielded as
+    ContactData objects one at a time, so that the memory usage is bounded by the largest entry. In inference only mode
+    the training only fields of ContactData are dropped while cleansing.
+
+    The selections for training and testing are answered from a columnar index of all contact data and a flattened table
+    of all annotated lines. Both are built in a single pass and cached as feather files next to the contact data file
+    until the contact data file changes. They depend on the line annotations and are therefore not available in
+    inference only mode.
+
     Instance variables:
         - path: Path to the contact data json file.
-        - raw_data: Raw contact data.
-        - cleansed_data: Contact data in cleansed format saved as instances of ContactData.
+        - lazy: Whether the entries are streamed from the file instead of being kept in memory.
+        - inference_only: Whether the training only fields are dropped.
+        - raw_data: Raw contact data, None in lazy mode.
+        - cleansed_data: Contact data in cleansed format saved as instances of ContactData, None in lazy mode.
 
     Public methods:
         - contact_data: Retrieve contact data object at the specified index.
+        - corpus_index: Retrieve country code, annotation flag and annotated line count of every contact data.
+        - line_table: Retrieve every annotated line with its classification.
+        - language_counts: Calculate count of contact data objects for each country.
+        - misleading_training_data: Prepare and retrieve relevant data for training of the binary classifier.
+        - classification_test_data: Retrieve indices of the contact data without annotations.
     """
 
-    def __init__(self, path: str):
+    _chunk_size = 1 << 20
+
+    def __init__(self, path: str, lazy: bool = False, inference_only: bool = False):
         """
         Initialize DataLoader object.
 
         :raise FileNotFoundError: If file at path doesn't exist.
         :param path: Path to the contact data json file.
+        :param lazy: Whether the entries are streamed from the file instead of being kept in memory.
+        :param inference_only: Whether the training only fields are dropped.
         """
 
         if not os.path.exists(path):
             raise FileNotFoundError(path)
 
         self._path: str = path
-        self._raw_data: List[Dict[str, Any]] = self._load_raw_data()
-        self._cleansed_data: List[ContactData] = self._load_cleansed_data()
+        self._lazy: bool = lazy
+        self._inference_only: bool = inference_only
+        self._corpus_index: pd.DataFrame = None
+        self._line_table: pd.DataFrame = None
+        self._raw_data: List[Dict[str, Any]] = None if lazy else self._load_raw_data()
+        self._cleansed_data: List[ContactData] = None if lazy else self._load_cleansed_data()
 
     def _load_raw_data(self) -> List[Dict[str, Any]]:
         """
@@ -46,6 +73,95 @@ class DataLoader:
 
         return data
 
+    def _stream_raw_data(self) -> Iterator[Dict[str, Any]]:
+        """
+        Parse the entries of the contact data json file incrementally.
+
+        :raise ValueError: If the file doesn't contain a json array.
+        :return: Raw contact data of one website at a time.
+        """
+
+        decoder: json.JSONDecoder = json.JSONDecoder()
+
+        with open(self.path, 'r') as json_file:
+            buffer: str = ''
+            position: int = 0
+            opened: bool = False
+
+            while True:
+                while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                    position += 1
+
+                if position == len(buffer):
+                    chunk: str = json_file.read(self._chunk_size)
+
+                    if not chunk:
+                        raise ValueError(f'Unexpected end of {self.path}!')
+
+                    buffer, position = chunk, 0
+
+                    continue
+
+                if not opened:
+                    if buffer[position] != '[':
+                        raise ValueError(f'{self.path} must contain a json array!')
+
+                    opened = True
+                    position += 1
+
+                    continue
+
+                if buffer[position] == ']':
+                    return
+
+                try:
+                    entry, position = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    # The entry is incomplete, so read at least as much as is buffered to avoid parsing it too often
+                    chunk: str = json_file.read(max(self._chunk_size, len(buffer) - position))
+
+                    if not chunk:
+                        raise
+
+                    buffer, position = buffer[position:] + chunk, 0
+
+                    continue
+
+                yield entry
+
+    @staticmethod
+    def _fields(entry: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Retrieve only the content of the important fields of a raw entry from the contact data json file.
+
+        :param entry: Raw contact data of one website.
+        :return: Fields of the contact data.
+        """
+
+        return {'country_code': entry['country_code'], 'raw_input': entry['raw_input']['text'],
+                'fixed_input': entry['fixed_input']['text'],
+                'crawled_imprint': entry['description']['crawledImprint'],
+                'crawled_website': entry['description']['crawledWebsite'],
+                'line_annotations': entry['lineAnnotation'],
+                'expected_contact_data': entry['expectedContact'],
+                'token_annotations': entry['tokenAnnotation']}
+
+    def _cleanse(self, entry: Dict[str, Any]) -> ContactData:
+        """
+        Cleanse a raw entry from the contact data json file to retrieve only the content of the important fields.
+
+        :param entry: Raw contact data of one website.
+        :return: Cleansed contact data.
+        """
+
+        fields: Dict[str, Any] = self._fields(entry)
+
+        if self.inference_only:
+            for field in ContactData.training_fields:
+                del fields[field]
+
+        return ContactData(fields)
+
     def _load_cleansed_data(self) -> List[ContactData]:
         """
         Cleanse raw data from contact data json file to retrieve only the content of the important fields.
@@ -63,72 +179,180 @@ class DataLoader:
         :return cleansed_data: Cleansed contact data.
         """
 
-        return [ContactData({'country_code': entry['country_code'], 'raw_input': entry['raw_input']['text'],
-                             'fixed_input': entry['fixed_input']['text'],
-                             'crawled_imprint': entry['description']['crawledImprint'],
-                             'crawled_website': entry['description']['crawledWebsite'],
-                             'line_annotations': entry['lineAnnotation'],
-                             'expected_contact_data': entry['expectedContact'],
-                             'token_annotations': entry['tokenAnnotation']}) for entry in self.raw_data]
+        return [self._cleanse(entry) for entry in self.raw_data]
+
+    def __iter__(self) -> Iterator[ContactData]:
+        """
+        Iterate over all contact data objects, streamed from the file in lazy mode.
+
+        :return: Contact data of one website at a time.
+        """
+
+        if self.lazy:
+            return (self._cleanse(entry) for entry in self._stream_raw_data())
+
+        return iter(self.cleansed_data)
 
     def contact_data(self, index: int):
         """
-        Retrieve contact data object at the specified index.
+        Retrieve contact data object at the specified index. In lazy mode the file is streamed up to the index.
 
+        :raise IndexError: If there is no contact data at the specified index.
         :params index: Index of the specified contact data.
         :return: Contact data.
         """
 
-        return self.cleansed_data[index]
+        if not self.lazy:
+            return self.cleansed_data[index]
+
+        if index < 0:
+            raise IndexError('Negative indices are not supported in lazy mode!')
+
+        for contact_data in islice(self, index, None):
+            return contact_data
+
+        raise IndexError(index)
+
+    def _cached_frame(self, name: str, build) -> pd.DataFrame:
+        """
+        Read a frame from its feather file next to the contact data file or build and write it, if the feather file is
+        missing or older than the contact data file.
+
+        :raise ValueError: If the training only fields are dropped.
+        :param name: Name of the frame, used in the name of the feather file.
+        :param build: Function to build the frame.
+        :return: The frame.
+        """
+
+        if self.inference_only:
+            raise ValueError('Training selections need the line annotations, which are dropped in inference only mode!')
+
+        path: str = f'{self.path}.{name}.feather'
+
+        if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(self.path):
+            return pd.read_feather(path)
+
+        frame: pd.DataFrame = build()
+        frame.to_feather(path)
+
+        return frame
+
+    def _build_corpus_index(self) -> pd.DataFrame:
+        country_codes: List[str] = []
+        line_counts: List[int] = []
+
+        for contact_data in self:
+            country_codes.append(contact_data.country_code)
+            line_counts.append(len(contact_data.line_annotations) if contact_data.line_annotations else 0)
+
+        return pd.DataFrame({'country_code': pd.Series(country_codes, dtype=object),
+                             'has_annotations': np.array(line_counts, dtype=np.int64) > 0,
+                             'line_count': np.array(line_counts, dtype=np.int64)})
+
+    def _build_line_table(self) -> pd.DataFrame:
+        documents: List[int] = []
+        country_codes: List[str] = []
+        lines: List[str] = []
+        classifications: List[bool] = []
+
+        for index, contact_data in enumerate(self):
+            for line in contact_data.line_annotations or []:
+                if 'text' in line and 'blockId' in line:
+                    documents.append(index)
+                    country_codes.append(contact_data.country_code)
+                    lines.append(line['text'])
+                    classifications.append(line['blockId'] is None or line['isMisleading'] is True)
+
+        return pd.DataFrame({'document': np.array(documents, dtype=np.int64),
+                             'country_code': pd.Series(country_codes, dtype=object),
+                             'line': pd.Series(lines, dtype=object),
+                             'is_misleading': np.array(classifications, dtype=bool)})
+
+    def corpus_index(self) -> pd.DataFrame:
+        """
+        Retrieve the columnar index of all contact data, built once and cached.
+
+        :raise ValueError: If the training only fields are dropped.
+        :return: Country code, whether there are line annotations and count of line annotations of every contact data
+            in the order of the contact data.
+        """
+
+        if self._corpus_index is None:
+            self._corpus_index = self._cached_frame('index', self._build_corpus_index)
+
+        return self._corpus_index
+
+    def line_table(self) -> pd.DataFrame:
+        """
+        Retrieve the flattened table of all annotated lines, built once and cached.
+
+        :raise ValueError: If the training only fields are dropped.
+        :return: Index of the contact data, country code, text and classification of every annotated line.
+        """
+
+        if self._line_table is None:
+            self._line_table = self._cached_frame('lines', self._build_line_table)
+
+        return self._line_table
 
     def language_counts(self) -> Dict[str, int]:
         """
         Calculate count of contact data objects for each country.
 
-        :return language_counts: Count of contact data objects for each country.
+        :return language_counts: Count of contact data objects for each country in order of their first occurrence.
         """
 
-        language_counts: Dict[str, int] = {}
+        if self.inference_only:
+            # The corpus index isn't available without line annotations, but the country codes are
+            language_counts: Dict[str, int] = {}
+
+            for contact_data in self:
+                language_counts[contact_data.country_code] = language_counts.get(contact_data.country_code, 0) + 1
 
-        for data in self.cleansed_data:
-            if data.country_code in language_counts:
-                language_counts[data.country_code] += 1
-            else:
-                language_counts[data.country_code] = 1
+            return language_counts
 
-        return language_counts
+        counts: pd.Series = self.corpus_index().groupby('country_code', sort=False).size()
+
+        return {country_code: int(count) for country_code, count in counts.items()}
 
     def misleading_training_data(self, languages: Tuple[str, ...]) -> List[Dict[str, Any]]:
         """
         Prepare and retrieve relevant data for training of the binary classifier.
 
+        :raise ValueError: If the training only fields are dropped.
         :params languages: Languages that should be taken into account.
         :return data: Sentences and classifications of the contact data lines.
         """
 
-        data: List[Dict[str, Any]] = []
+        table: pd.DataFrame = self.line_table()
 
-        for index, contact_data in enumerate(self.cleansed_data):
-            if contact_data.line_annotations and contact_data.country_code in languages:
-                for line in contact_data.line_annotations:
-                    if 'text' in line and 'blockId' in line:
-                        data.append({'line': line['text'], 'is_misleading': True if line['blockId'] is None else True if line['isMisleading'] is True else False})
-
-        return data
+        return table.loc[table['country_code'].isin(languages), ['line', 'is_misleading']].to_dict('records')
 
     def classification_test_data(self, languages: Tuple[str, ...]) -> List[int]:
-        data: List[int] = []
+        """
+        Retrieve the indices of the contact data without line annotations.
 
-        for index, contact_data in enumerate(self.cleansed_data):
-            if not contact_data.line_annotations and contact_data.country_code in languages:
-                data.append(index)
+        :raise ValueError: If the training only fields are dropped.
+        :params languages: Languages that should be taken into account.
+        :return data: Indices of the contact data.
+        """
 
-        return data
+        index: pd.DataFrame = self.corpus_index()
+
+        return np.flatnonzero(~index['has_annotations'].to_numpy() & index['country_code'].isin(languages).to_numpy()).tolist()
 
     @property
     def path(self) -> str:
         return self._path
 
+    @property
+    def lazy(self) -> bool:
+        return self._lazy
+
+    @property
+    def inference_only(self) -> bool:
+        return self._inference_only
+
     @property
     def raw_data(self) -> List[Dict[str, Any]]:
         return self._raw_data
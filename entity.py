@@ -0,0 +1,122 @@
+from enum import Enum
+from typing import Any, Dict
+
+
+class EntityType(Enum):
+    """
+    This is an enumeration of the types of extracted entities. The values are the legacy type strings, in which an
+    underscore separates the tag of the contact data field from the sub-field of a match that makes up only a part of
+    the field, e.g. street_road and street_house_number both make up the street.
+
+    Instance variables:
+        - tag: Contact data field the entity belongs to.
+        - field: Sub-field of the contact data field, None if the entity makes up the whole field.
+    """
+
+    EMAIL = 'email'
+    WEBSITE = 'website'
+    VAT = 'vat'
+    PHONE = 'phone'
+    MOBILE = 'mobile'
+    FAX = 'fax'
+    ORGANIZATION = 'organization'
+    TITLE = 'title'
+    TITLE_PREFIX_MARITAL = 'title_prefix_marital'
+    TITLE_PREFIX_OTHER = 'title_prefix_other'
+    FIRST_NAME_GIVEN_NAME = 'firstName_given_name'
+    FIRST_NAME_MIDDLE_NAME = 'firstName_middle_name'
+    LAST_NAME = 'lastName'
+    PO_BOX = 'poBox'
+    ZIP = 'zip'
+    STREET_HOUSE_NUMBER = 'street_house_number'
+    STREET_ROAD = 'street_road'
+    STREET2_UNIT = 'street2_unit'
+    STREET2_LEVEL = 'street2_level'
+    STREET2_STAIRCASE = 'street2_staircase'
+    STREET2_ENTRANCE = 'street2_entrance'
+    STREET2_HOUSE = 'street2_house'
+    STREET2_CATEGORY = 'street2_category'
+    STREET2_NEAR = 'street2_near'
+    CITY_SUBURB = 'city_suburb'
+    CITY_CITY_DISTRICT = 'city_city_district'
+    CITY_CITY = 'city_city'
+    STATE = 'state'
+    COUNTRY = 'country'
+
+    def __init__(self, value: str):
+        # Split the type string once per member instead of once per entity
+        tag, _, field = value.partition('_')
+        self.tag: str = tag
+        self.field: str = field if field else None
+
+
+class Entity:
+    """
+    This is a class to save one extracted entity.
+
+    Instance variables:
+        - type: Type of the entity.
+        - match: Matched text.
+        - index: Index of the line the entity was extracted from.
+
+    Public methods:
+        - with_index: Copy the entity to another line.
+        - to_dict: Convert the entity into the legacy dictionary format.
+    """
+
+    __slots__ = ('_type', '_match', '_index')
+
+    def __init__(self, type: EntityType, match: str, index: int):
+        """
+        Initialize Entity object.
+
+        :param type: Type of the entity.
+        :param match: Matched text.
+        :param index: Index of the line the entity was extracted from.
+        """
+
+        self._type: EntityType = type
+        self._match: str = match
+        self._index: int = index
+
+    def with_index(self, index: int) -> 'Entity':
+        return Entity(self.type, self.match, index)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert the entity into the legacy dictionary format.
+
+        :return: Type string, matched text and line index of the entity.
+        """
+
+        return {'type': self.type.value, 'match': self.match, 'index': self.index}
+
+    @property
+    def type(self) -> EntityType:
+        return self._type
+
+    @property
+    def match(self) -> str:
+        return self._match
+
+    @property
+    def index(self) -> int:
+        return self._index
+
+    def __eq__(self, other):
+        if not isinstance(other, Entity):
+            return NotImplemented
+
+        return (self.type, self.match, self.index) == (other.type, other.match, other.index)
+
+    def __hash__(self):
+        return hash((self.type, self.match, self.index))
+
+    def __getstate__(self):
+        return self.type, self.match, self.index
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def __repr__(self):
+        return f'<Entity {self.type.value} {self.match!r} at {self.index}>'
@@ -0,0 +1,545 @@
+import argparse
+import asyncio
+import json
+import os
+import re
+import time
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Tuple, Type, Deque, Coroutine
+
+from contact_data import ContactData
+from contact_data_retrieval import ContactDataRetrieval
+from extractors.ner_pipelines import NamedEntityRecognizer
+
+
+class NERMicroBatcher:
+    """
+    This is a class to recognize the named entities of concurrent documents in shared batches.
+
+    The lines of all documents waiting for the same recognizer are combined into one call of the recognizer as soon as
+    they reach the maximum batch size or the first of them has waited for the maximum wait, whichever comes first. A
+    document that would push the pending lines above the maximum batch size sends them off without it first.
+
+    Instance variables:
+        - max_batch_size: Maximum count of lines per batch, a single larger document is recognized on its own.
+        - max_wait: Maximum wait of a document for further documents in milliseconds.
+        - batch_sizes: Count of lines of the recent batches.
+
+    Public methods:
+        - recognize: Recognize the named entities of the lines of one document.
+    """
+
+    def __init__(self, max_batch_size: int = 256, max_wait: float = 10):
+        """
+        Initialize NERMicroBatcher object.
+
+        :param max_batch_size: Maximum count of lines per batch.
+        :param max_wait: Maximum wait of a document for further documents in milliseconds.
+        """
+
+        self._max_batch_size: int = max_batch_size
+        self._max_wait: float = max_wait
+        self._pending: Dict[Tuple[Any, ...], List[Tuple[Dict[int, str], asyncio.Future]]] = {}
+        self._recognizers: Dict[Tuple[Any, ...], NamedEntityRecognizer] = {}
+        self._timers: Dict[Tuple[Any, ...], asyncio.TimerHandle] = {}
+        # A single thread runs the models, so that batches don't compete for the CPUs
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ner')
+        self._batch_sizes: Deque[int] = deque(maxlen=10000)
+
+    async def recognize(self, recognizer: NamedEntityRecognizer,
+                        lines: Dict[int, str]) -> Dict[int, List[Dict[str, Any]]]:
+        """
+        Recognize the named entities of the lines of one document in a batch with the lines of other documents.
+
+        :param recognizer: Recognizer of the document.
+        :param lines: Lines of the document.
+        :return: Entities of every line.
+        """
+
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        future: asyncio.Future = loop.create_future()
+        key: Tuple[Any, ...] = recognizer.key
+
+        # The pending batch goes out on its own, if the document would push it above the maximum batch size
+        if self._pending_lines(key) + len(lines) > self.max_batch_size:
+            self._flush(key)
+
+        self._recognizers[key] = recognizer
+        self._pending.setdefault(key, []).append((lines, future))
+
+        if self._pending_lines(key) >= self.max_batch_size:
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.max_wait / 1000, self._flush, key)
+
+        return await future
+
+    def _pending_lines(self, key: Tuple[Any, ...]) -> int:
+        return sum(len(pending_lines) for pending_lines, _ in self._pending.get(key, []))
+
+    def _flush(self, key: Tuple[Any, ...]):
+        timer: asyncio.TimerHandle = self._timers.pop(key, None)
+
+        if timer is not None:
+            timer.cancel()
+
+        if self._pending.get(key):
+            asyncio.get_running_loop().create_task(self._run(self._recognizers[key], self._pending.pop(key)))
+
+    async def _run(self, recognizer: NamedEntityRecognizer, batch: List[Tuple[Dict[int, str], asyncio.Future]]):
+        """
+        Recognize the named entities of a batch in one call of the recognizer and hand them back to every document.
+
+        :param recognizer: Recognizer of all documents in the batch.
+        :param batch: Lines and pending result of every document.
+        """
+
+        combined: Dict[int, str] = {}
+        owners: List[Tuple[int, int]] = []
+
+        for document, (lines, _) in enumerate(batch):
+            for line_index, line in lines.items():
+                owners.append((document, line_index))
+                combined[len(combined)] = line
+
+        self._batch_sizes.append(len(combined))
+
+        try:
+            entities: Dict[int, List[Dict[str, Any]]] = await asyncio.get_running_loop().run_in_executor(
+                self._executor, recognizer, combined)
+        except Exception as error:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+
+            return
+
+        results: List[Dict[int, List[Dict[str, Any]]]] = [{} for _ in batch]
+
+        for combined_index, (document, line_index) in enumerate(owners):
+            results[document][line_index] = entities.get(combined_index, [])
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+    @property
+    def max_batch_size(self) -> int:
+        return self._max_batch_size
+
+    @property
+    def max_wait(self) -> float:
+        return self._max_wait
+
+    @property
+    def batch_sizes(self) -> Deque[int]:
+        return self._batch_sizes
+
+
+class ExtractionService:
+    """
+    This is a class to serve the contact data retrieval to local clients over a unix socket or tcp.
+
+    Clients send one json object per line, either {"id": ..., "contact_data": {...}, "filters": [...]} with the fields
+    country_code, raw_input, crawled_imprint and crawled_website of the contact data, or {"id": ..., "command":
+    "stats"}. Every request is answered by one json object per line with the same id and either "blocks", "stats" or
+    "error". Requests of one connection are processed concurrently and may be answered out of order.
+
+    A request line may be as long as the stream limit. Longer requests are skipped and answered with an error. Their id
+    can only be recovered if it is the first field of the request.
+
+    At most max_concurrency documents are processed at once. Further requests wait before they are read, so that slow
+    processing pushes back on the clients through the socket buffers instead of queueing up in memory.
+
+    Instance variables:
+        - filters: Filters for requests that don't specify any.
+        - settings: Country specific settings as passed to ContactDataRetrieval.
+        - max_concurrency: Maximum count of documents processed at once.
+        - batcher: Micro-batcher of the named entity recognition.
+
+    Public methods:
+        - start: Start listening on a unix socket or on a tcp port.
+        - serve_forever: Serve requests until the service is closed.
+        - close: Stop listening and release all resources.
+        - stats: Retrieve count of requests, latency percentiles and mean batch size.
+    """
+
+    # Retrieves the blocks of one document, replaceable e.g. by a stub in tests
+    retrieval: Type[ContactDataRetrieval] = ContactDataRetrieval
+    _stream_limit = 1 << 28
+    _leading_id = re.compile(rb'\s*{\s*"id"\s*:\s*(-?\d+|"[^"\\]*"|null)')
+
+    def __init__(self, filters: List[str] = None, settings: Dict[str, Dict[str, Any]] = None,
+                 max_concurrency: int = 32, max_batch_size: int = 256, max_wait: float = 10):
+        """
+        Initialize ExtractionService object.
+
+        :param filters: Filters for requests that don't specify any.
+        :param settings: Country specific settings as passed to ContactDataRetrieval.
+        :param max_concurrency: Maximum count of documents processed at once.
+        :param max_batch_size: Maximum count of lines per named entity recognition batch.
+        :param max_wait: Maximum wait of a document for further documents in milliseconds.
+        """
+
+        self._filters: List[str] = filters if filters is not None else []
+        self._settings: Dict[str, Dict[str, Any]] = settings if settings is not None else {}
+        self._max_concurrency: int = max_concurrency
+        self._batcher: NERMicroBatcher = NERMicroBatcher(max_batch_size=max_batch_size, max_wait=max_wait)
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=max_concurrency,
+                                                                thread_name_prefix='retrieval')
+        self._semaphore: asyncio.Semaphore = None
+        self._server: asyncio.AbstractServer = None
+        self._latencies: Deque[float] = deque(maxlen=10000)
+        self._requests: int = 0
+        self._errors: int = 0
+
+    async def start(self, path: str = None, host: str = '127.0.0.1', port: int = 8765):
+        """
+        Start listening on a unix socket, if a path is given, otherwise on a tcp port.
+
+        :param path: Path to the unix socket.
+        :param host: Host of the tcp socket.
+        :param port: Port of the tcp socket.
+        """
+
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        if path is not None:
+            if os.path.exists(path):
+                os.remove(path)
+
+            self._server = await asyncio.start_unix_server(self._handle, path=path, limit=self._stream_limit)
+        else:
+            self._server = await asyncio.start_server(self._handle, host=host, port=port, limit=self._stream_limit)
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+        self._executor.shutdown(wait=False)
+        self.batcher.close()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Read the requests of one connection and answer each of them as soon as it is processed.
+
+        :param reader: Reader of the connection.
+        :param writer: Writer of the connection.
+        """
+
+        tasks: List[asyncio.Task] = []
+        # Answers of concurrent requests must not interleave and writers mustn't be drained concurrently
+        writing: asyncio.Lock = asyncio.Lock()
+
+        try:
+            while True:
+                # Wait for a free slot before reading, so that the socket buffers fill up while the service is busy
+                await self._semaphore.acquire()
+
+                try:
+                    line, skipped = await self._read_line(reader)
+                except Exception:
+                    self._semaphore.release()
+
+                    raise
+
+                if skipped:
+                    answering: Coroutine = self._reject(line, writer, writing)
+                elif line:
+                    answering: Coroutine = self._answer(line, writer, writing)
+                else:
+                    self._semaphore.release()
+
+                    break
+
+                task: asyncio.Task = asyncio.get_running_loop().create_task(answering)
+                task.add_done_callback(lambda k: self._semaphore.release())
+                tasks = [pending for pending in tasks if not pending.done()] + [task]
+
+            await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_line(reader: asyncio.StreamReader) -> Tuple[bytes, bool]:
+        """
+        Read one request line. A line longer than the stream limit is skipped up to its end instead, so that the
+        following requests can still be read.
+
+        :param reader: Reader of the connection.
+        :return: The line, empty at the end of the connection, or the start of a skipped line and whether the line was
+            skipped.
+        """
+
+        head: bytes = None
+
+        while True:
+            try:
+                line: bytes = await reader.readuntil(b'\n')
+            except asyncio.IncompleteReadError as error:
+                line: bytes = error.partial
+            except asyncio.LimitOverrunError as error:
+                skipped: bytes = await reader.readexactly(error.consumed)
+                head = head if head is not None else skipped[:1024]
+
+                continue
+
+            return (line, False) if head is None else (head, True)
+
+    async def _reject(self, head: bytes, writer: asyncio.StreamWriter, writing: asyncio.Lock):
+        """
+        Answer a request that was skipped, because it is longer than the stream limit.
+
+        :param head: Start of the request.
+        :param writer: Writer of the connection.
+        :param writing: Lock of the writer.
+        """
+
+        match = self._leading_id.match(head)
+        self._errors += 1
+        await self._respond({'id': json.loads(match.group(1)) if match else None,
+                             'error': repr(ValueError(f'Request exceeds the limit of {self._stream_limit} bytes!'))},
+                            writer, writing)
+
+    async def _answer(self, line: bytes, writer: asyncio.StreamWriter, writing: asyncio.Lock):
+        """
+        Answer one request.
+
+        :param line: Json encoded request.
+        :param writer: Writer of the connection.
+        :param writing: Lock of the writer.
+        """
+
+        start: float = time.perf_counter()
+        request: Dict[str, Any] = {}
+
+        try:
+            request = json.loads(line)
+
+            if request.get('command') == 'stats':
+                response: Dict[str, Any] = {'id': request.get('id'), 'stats': self.stats()}
+            else:
+                blocks: Dict[str, Any] = await self._retrieve(ContactData(request['contact_data']),
+                                                              request.get('filters') or self.filters)
+                response: Dict[str, Any] = {'id': request.get('id'), 'blocks': blocks}
+                self._latencies.append(time.perf_counter() - start)
+                self._requests += 1
+        except Exception as error:
+            self._errors += 1
+            response: Dict[str, Any] = {'id': request.get('id') if isinstance(request, dict) else None,
+                                        'error': repr(error)}
+
+        await self._respond(response, writer, writing)
+
+    @staticmethod
+    async def _respond(response: Dict[str, Any], writer: asyncio.StreamWriter, writing: asyncio.Lock):
+        """
+        Write one answer.
+
+        :param response: Answer to the request.
+        :param writer: Writer of the connection.
+        :param writing: Lock of the writer.
+        """
+
+        async with writing:
+            writer.write(json.dumps(response, default=str).encode('utf-8') + b'\n')
+            await writer.drain()
+
+    async def _retrieve(self, contact_data: ContactData, filters: List[str]) -> Dict[str, Any]:
+        """
+        Retrieve the contact data blocks of one document in a worker thread, whose named entity recognition is handed
+        back to the event loop to be batched with other documents.
+
+        :param contact_data: Contact data of the document.
+        :param filters: Names of the filters.
+        :return: Contact data blocks.
+        """
+
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+
+        def recognize(recognizer: NamedEntityRecognizer, lines: Dict[int, str]) -> Dict[int, List[Dict[str, Any]]]:
+            return asyncio.run_coroutine_threadsafe(self.batcher.recognize(recognizer, lines), loop).result()
+
+        def retrieve() -> Dict[str, Any]:
+            return self.retrieval(contact_data=contact_data, filters=filters, settings=self.settings,
+                                  recognize=recognize).blocks()
+
+        return await loop.run_in_executor(self._executor, retrieve)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retrieve count of requests and errors, latency percentiles of the recent requests in milliseconds and mean
+        count of lines of the recent named entity recognition batches.
+
+        :return: Statistics of the service.
+        """
+
+        latencies: List[float] = sorted(self._latencies)
+        batch_sizes: Deque[int] = self.batcher.batch_sizes
+
+        def percentile(share: float) -> float:
+            if not latencies:
+                return None
+
+            return latencies[min(len(latencies) - 1, int(share * len(latencies)))] * 1000
+
+        return {'requests': self._requests, 'errors': self._errors, 'p50': percentile(0.5), 'p95': percentile(0.95),
+                'p99': percentile(0.99),
+                'mean_batch_size': sum(batch_sizes) / len(batch_sizes) if batch_sizes else None}
+
+    @property
+    def filters(self) -> List[str]:
+        return self._filters
+
+    @property
+    def settings(self) -> Dict[str, Dict[str, Any]]:
+        return self._settings
+
+    @property
+    def max_concurrency(self) -> int:
+        return self._max_concurrency
+
+    @property
+    def batcher(self) -> NERMicroBatcher:
+        return self._batcher
+
+
+class ExtractionClient:
+    """
+    This is a class to send requests to a local extraction service over one connection. Concurrent requests share the
+    connection and their answers are matched by id.
+
+    Public methods:
+        - connect: Connect to a unix socket or to a tcp port.
+        - extract: Retrieve the contact data blocks of one document.
+        - stats: Retrieve the statistics of the service.
+        - close: Close the connection.
+    """
+
+    _stream_limit = 1 << 28
+
+    def __init__(self):
+        """
+        Initialize ExtractionClient object.
+        """
+
+        self._reader: asyncio.StreamReader = None
+        self._writer: asyncio.StreamWriter = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._next_id: int = 0
+        self._receiving: asyncio.Task = None
+
+    async def connect(self, path: str = None, host: str = '127.0.0.1', port: int = 8765):
+        """
+        Connect to a unix socket, if a path is given, otherwise to a tcp port.
+
+        :param path: Path to the unix socket.
+        :param host: Host of the tcp socket.
+        :param port: Port of the tcp socket.
+        """
+
+        if path is not None:
+            self._reader, self._writer = await asyncio.open_unix_connection(path, limit=self._stream_limit)
+        else:
+            self._reader, self._writer = await asyncio.open_connection(host, port, limit=self._stream_limit)
+
+        self._receiving = asyncio.get_running_loop().create_task(self._receive())
+
+    async def _receive(self):
+        while True:
+            line: bytes = await self._reader.readline()
+
+            if not line:
+                break
+
+            response: Dict[str, Any] = json.loads(line)
+            future: asyncio.Future = self._pending.pop(response.get('id'), None)
+
+            if future is not None and not future.done():
+                future.set_result(response)
+
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError('Connection to the extraction service was closed!'))
+
+    async def _request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        # The id goes first, so that the service can answer requests above its limit
+        request, self._next_id = {'id': self._next_id, **request}, self._next_id + 1
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._pending[request['id']] = future
+
+        self._writer.write(json.dumps(request).encode('utf-8') + b'\n')
+        await self._writer.drain()
+
+        return await future
+
+    async def extract(self, contact_data: Dict[str, Any], filters: List[str] = None) -> Dict[str, Any]:
+        """
+        Retrieve the contact data blocks of one document.
+
+        :raise RuntimeError: If the service failed to process the document.
+        :param contact_data: Fields country_code, raw_input, crawled_imprint and crawled_website of the contact data.
+        :param filters: Names of the filters, the default filters of the service if None.
+        :return: Contact data blocks.
+        """
+
+        response: Dict[str, Any] = await self._request({'contact_data': contact_data, 'filters': filters})
+
+        if 'error' in response:
+            raise RuntimeError(response['error'])
+
+        return response['blocks']
+
+    async def stats(self) -> Dict[str, Any]:
+        return (await self._request({'command': 'stats'}))['stats']
+
+    async def close(self):
+        self._writer.close()
+        await self._receiving
+
+
+async def _serve(arguments: argparse.Namespace):
+    settings: Dict[str, Dict[str, Any]] = None
+
+    if arguments.settings is not None:
+        with open(arguments.settings, 'r') as settings_file:
+            settings = json.load(settings_file)
+
+    service: ExtractionService = ExtractionService(filters=arguments.filters, settings=settings,
+                                                   max_concurrency=arguments.max_concurrency,
+                                                   max_batch_size=arguments.max_batch_size,
+                                                   max_wait=arguments.max_wait)
+    service.retrieval.preload(service.filters, service.settings)
+    await service.start(path=arguments.socket, host=arguments.host, port=arguments.port)
+
+    try:
+        await service.serve_forever()
+    finally:
+        print(service.stats())
+        await service.close()
+
+
+if __name__ == '__main__':
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Serve the contact data retrieval.')
+    parser.add_argument('--socket', default=None, help='path to a unix socket, tcp is used if omitted')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--filters', nargs='*', default=['e_mails', 'human_names', 'locations', 'phone_numbers',
+                                                         'organizations', 'vat_numbers'])
+    parser.add_argument('--settings', default=None,
+                        help='path to a json file of country specific settings keyed by country code')
+    parser.add_argument('--max-concurrency', type=int, default=32)
+    parser.add_argument('--max-batch-size', type=int, default=256, help='maximum count of lines per NER batch')
+    parser.add_argument('--max-wait', type=float, default=10, help='maximum wait for a NER batch in milliseconds')
+
+    asyncio.run(_serve(parser.parse_args()))
@@ -1,9 +1,10 @@
+from entity import EntityType
 from extractors.extracting_tasks import RegExExtractingTask
 
 
 class EMailAddressExtractor(RegExExtractingTask):
     pattern = r'[a-zA-Z0-9\.\-+_]+(?:@|\(at\))[a-zA-Z0-9\.\-+_]+\.[a-z]+'
-    type = 'email'
+    type = EntityType.EMAIL
 
 
 if __name__ == '__main__':
@@ -1,13 +1,21 @@
 import re
 
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List
+from bisect import bisect_right
+from typing import Any, Callable, Dict, Iterator, List, Match, Pattern, Tuple, Type
+
+from entity import Entity, EntityType
+from extractors.ner_pipelines import NERModelRegistry, NamedEntityRecognizer
+from persistent_cache import PersistentCache
 
 
 class ExtractingTask(ABC):
+    # Whether the matches of a line depend only on its text, so that identical lines need to be extracted only once
+    context_free = True
+
     @property
     @abstractmethod
-    def extracted(self) -> List[Dict[str, Any]]:
+    def extracted(self) -> List[Entity]:
         """
         Returns the extracted matches from all lines.
 
@@ -16,30 +24,109 @@ class ExtractingTask(ABC):
 
         raise NotImplementedError('This method must be implemented!')
 
+    def __iter__(self) -> Iterator[Entity]:
+        """
+        Iterates over the extracted matches in line order.
+
+        :returns: The matches.
+        """
+
+        return iter(self.extracted)
+
 
 class RegExExtractingTask(ExtractingTask):
     pattern = None
-    type = None
+    type: EntityType = None
+    document_level = False
+    crosses_lines = False
+    registry: List[Type['RegExExtractingTask']] = []
 
     def __init__(self, lines: Dict[int, str]):
         self._lines: Dict[int, str] = lines
-        self._extracted: List[Dict[str, Any]] = self._extract()
+        self._extracted: List[Entity] = self._extract()
 
-    def _extract(self):
-        if self.pattern is None:
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+
+        # Every extractor with a pattern joins the combined pattern of the RegExScanner
+        if cls.pattern is not None:
+            RegExExtractingTask.registry.append(cls)
+
+        # Matches across lines depend on the neighbouring lines
+        if cls.crosses_lines:
+            cls.context_free = False
+
+    @classmethod
+    def compiled(cls) -> Pattern:
+        if cls.pattern is None:
             raise TypeError('No pattern specified!')
 
-        extracted: List[Dict[str, Any]] = []
+        if '_compiled' not in cls.__dict__:
+            cls._compiled = re.compile(cls.pattern)
+
+        return cls._compiled
+
+    @staticmethod
+    def document_matches(pattern: Pattern, lines: Dict[int, str],
+                         crosses_lines: Callable[[Match], bool] = lambda k: False) -> Iterator[Tuple[int, Match]]:
+        """
+        Scan the joined text of all lines once and map every match back to the line it starts in. Matches that cross a
+        line boundary are only kept if ``crosses_lines`` allows it, otherwise the line is scanned on its own instead.
+
+        :param pattern: Compiled pattern.
+        :param lines: Arbitrary number of lines.
+        :param crosses_lines: Decides whether a match may cross line boundaries.
+        :return: Line index and match of every match in the order of the text.
+        """
+
+        line_indices: List[int] = list(lines.keys())
+        text: str = '\n'.join(lines.values())
+        starts: List[int] = []
+        ends: List[int] = []
+        offset: int = 0
+
+        for line in lines.values():
+            starts.append(offset)
+            ends.append(offset + len(line))
+            offset += len(line) + 1
+
+        position: int = 0
+
+        while position <= len(text):
+            match: Match = pattern.search(text, position)
+
+            if match is None:
+                break
+
+            line_position: int = bisect_right(starts, match.start()) - 1
+
+            if match.end() > ends[line_position] and not crosses_lines(match):
+                match = pattern.search(text, max(position, starts[line_position]), ends[line_position])
+
+                if match is None:
+                    position = ends[line_position] + 1
+
+                    continue
+
+            yield line_indices[line_position], match
+
+            position = match.end() if match.end() > match.start() else match.start() + 1
+
+    def _extract(self):
+        pattern: Pattern = self.compiled()
+        extracted: List[Entity] = []
+
+        if self.document_level:
+            for line_index, match in self.document_matches(pattern, self.lines, lambda k: self.crosses_lines):
+                extracted.append(Entity(self.type, match.group(), line_index))
+
+            return extracted
 
         for line_index, line in self.lines.items():
-            matches: List[str] = re.findall(self.pattern, line)
+            matches: List[str] = pattern.findall(line)
 
             for match in matches:
-                extracted.append({
-                    'type': self.type,
-                    'match': match,
-                    'index': line_index
-                })
+                extracted.append(Entity(self.type, match, line_index))
 
         return extracted
 
@@ -48,26 +135,65 @@ class RegExExtractingTask(ExtractingTask):
         return self._lines
 
     @property
-    def extracted(self) -> List[Dict[str, Any]]:
+    def extracted(self) -> List[Entity]:
         return self._extracted
 
 
 class NERExtractingTask(ExtractingTask):
     model = None
     tokenizer = None
-
-    def __init__(self, lines: Dict[int, str]):
+    device = -1
+    backend = 'fp32'
+    options = {'grouped_entities': True}
+    min_score = 0.9
+    batch_size = 16
+    cache: PersistentCache = None
+    max_tokens = 128
+    stride = 32
+    max_line_tokens = None
+
+    def __init__(self, lines: Dict[int, str], entities: Dict[int, List[Dict[str, Any]]] = None):
         self._lines: Dict[int, str] = lines
-        self._extracted: List[Dict[str, Any]] = self._extract()
+        self._entities: Dict[int, List[Dict[str, Any]]] = entities if entities is not None else self.recognizer()(lines)
+        self._extracted: List[Entity] = self._extract()
 
     @abstractmethod
     def _extract(self):
         raise NotImplementedError('This method must be implemented!')
 
+    @classmethod
+    def preload(cls, **settings):
+        recognizer: NamedEntityRecognizer = cls.recognizer(**settings)
+        NERModelRegistry.preload(recognizer.model, recognizer.tokenizer, recognizer.device, recognizer.backend,
+                                 **recognizer.options)
+
+    @classmethod
+    def recognizer(cls, **settings) -> NamedEntityRecognizer:
+        configuration: Dict[str, Any] = {
+            'model': cls.model,
+            'tokenizer': cls.tokenizer,
+            'device': cls.device,
+            'backend': cls.backend,
+            'options': cls.options,
+            'min_score': cls.min_score,
+            'batch_size': cls.batch_size,
+            'cache': cls.cache,
+            'max_tokens': cls.max_tokens,
+            'stride': cls.stride,
+            'max_line_tokens': cls.max_line_tokens
+        }
+        configuration.update(settings)
+
+        return NamedEntityRecognizer(**configuration)
+
     @property
     def lines(self):
         return self._lines
 
     @property
-    def extracted(self) -> List[Dict[str, Any]]:
+    def entities(self) -> Dict[int, List[Dict[str, Any]]]:
+        return self._entities
+
+    @property
+    def extracted(self) -> List[Entity]:
         return self._extracted
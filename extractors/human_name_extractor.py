@@ -1,9 +1,9 @@
 import re
 
-from typing import Any, Dict, List, Tuple, Match
-from transformers import Pipeline, pipeline
+from typing import Any, Dict, List, Tuple
 from probablepeople import parse
 
+from entity import Entity, EntityType
 from extractors.extracting_tasks import NERExtractingTask
 
 
@@ -11,11 +11,11 @@ class HumanNameExtractor(NERExtractingTask):
     model = 'xlm-roberta-large-finetuned-conll03-german'
     tokenizer = 'xlm-roberta-large-finetuned-conll03-german'
     _type_mappings = {
-        'GivenName': 'firstName_given_name',
-        'MiddleName': 'firstName_middle_name',
-        'Surname': 'lastName',
-        'PrefixMarital': 'title_prefix_marital',
-        'PrefixOther': 'title_prefix_other'
+        'GivenName': EntityType.FIRST_NAME_GIVEN_NAME,
+        'MiddleName': EntityType.FIRST_NAME_MIDDLE_NAME,
+        'Surname': EntityType.LAST_NAME,
+        'PrefixMarital': EntityType.TITLE_PREFIX_MARITAL,
+        'PrefixOther': EntityType.TITLE_PREFIX_OTHER
     }
     _academic_degrees = [
         r'b\.\s*sc\.', r'bachelor\s*of\s*science',
@@ -35,23 +35,14 @@ class HumanNameExtractor(NERExtractingTask):
         r'dr\.', r'ph\.\s*d\.', r'doktor', r'doctor',
         r'prof\.', r'professor'
     ]
+    _degree_pattern = re.compile('|'.join(f'(?:{degree})' for degree in _academic_degrees))
 
     def _extract(self):
-        ner_pipeline: Pipeline = pipeline('ner', model=self.model, tokenizer=self.tokenizer, grouped_entities=True)
-        extracted: List[Dict[str, Any]] = []
+        extracted: List[Entity] = []
 
         for line_index, line in self.lines.items():
-            temp: List[Dict[str, Any]] = []
-            entities = ner_pipeline(line)
-
-            delete: List[int] = []
-
-            for index in range(len(entities)):
-                if entities[index]['score'] < 0.9:
-                    delete.append(index)
-
-            for index in sorted(delete, reverse=True):
-                del entities[index]
+            temp: List[Entity] = []
+            entities: List[Dict[str, Any]] = self.entities[line_index]
 
             if any(entity.get('entity_group') == 'PER' for entity in entities):
                 for entity in entities:
@@ -60,50 +51,37 @@ class HumanNameExtractor(NERExtractingTask):
 
                         for name in names:
                             if name[1] in self._type_mappings:
-                                temp.append({
-                                    'type': self._type_mappings[name[1]],
-                                    'match': name[0],
-                                    'index': line_index
-                                })
+                                temp.append(Entity(self._type_mappings[name[1]], name[0], line_index))
 
-            remaining_line: str = line
-            to_insert: Dict[int, Dict[str, Any]] = {}
+            # Position in the line after the last located given or middle name
+            position: int = 0
+            to_insert: Dict[int, Entity] = {}
 
             for index in range(len(temp)):
-                degrees: List[Dict[str, Any]] = []
+                substring: str = ''
 
-                if temp[index]['type'] == 'firstName_given_name' or temp[index]['type'] == 'firstName_middle_name':
-                    if index == 0:
-                        match: Match = re.search(temp[index]['match'], remaining_line)
-                        substring: str = remaining_line[:match.start()].lower()
-                        remaining_line = remaining_line[match.end() + 1:]
+                if temp[index].type in (EntityType.FIRST_NAME_GIVEN_NAME, EntityType.FIRST_NAME_MIDDLE_NAME):
+                    name: str = temp[index].match
 
-                        for pattern in self._academic_degrees:
-                            degree: Match = re.search(pattern, substring)
+                    if index == 0:
+                        start: int = line.find(name, position)
 
-                            if degree:
-                                degrees.append({'start': degree.start(), 'match': degree.group(0)})
+                        if start != -1:
+                            substring = line[position:start]
+                            position = start + len(name) + 1
                     else:
-                        match: Match = re.search(r'' + temp[index - 1]['match'] + '(.*?)' + temp[index]['match'], remaining_line)
-
-                        if match:
-                            substring: str = match.group(0).lower()
-                            remaining_line = remaining_line[re.search(temp[index]['match'], remaining_line).end() + 1:]
+                        previous: str = temp[index - 1].match
+                        previous_start: int = line.find(previous, position)
+                        start: int = line.find(name, previous_start + len(previous)) if previous_start != -1 else -1
 
-                            for pattern in self._academic_degrees:
-                                degree: Match = re.search(pattern, substring)
+                        if start != -1:
+                            substring = line[previous_start:start + len(name)]
+                            position = line.find(name, position) + len(name) + 1
 
-                                if degree:
-                                    degrees.append({'start': degree.start(), 'match': degree.group(0)})
+                degrees: List[str] = [degree.group(0) for degree in self._degree_pattern.finditer(substring.lower())]
 
                 if degrees:
-                    degrees = sorted(degrees, key=lambda k: k['start'])
-                    assorted: List[str] = []
-
-                    for degree in degrees:
-                        assorted.append(degree['match'])
-
-                    to_insert[index] = {'type': 'title', 'match': ' '.join(assorted), 'index': line_index}
+                    to_insert[index] = Entity(EntityType.TITLE, ' '.join(degrees), line_index)
 
             counter: int = 0
 
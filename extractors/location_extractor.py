@@ -1,7 +1,7 @@
 from typing import List, Dict, Any, Tuple
 from postal.parser import parse_address
-from transformers import Pipeline, pipeline
 
+from entity import Entity, EntityType
 from extractors.extracting_tasks import NERExtractingTask
 
 
@@ -9,40 +9,30 @@ class LocationExtractor(NERExtractingTask):
     model = 'xlm-roberta-large-finetuned-conll03-german'
     tokenizer = 'xlm-roberta-large-finetuned-conll03-german'
     type_mappings = {
-        'po_box': 'poBox',
-        'postcode': 'zip',
-        'house_number': 'street_house_number',
-        'road': 'street_road',
-        'unit': 'street2_unit',
-        'level': 'street2_level',
-        'staircase': 'street2_staircase',
-        'entrance': 'street2_entrance',
-        'house': 'street2_house',
-        'category': 'street2_category',
-        'near': 'street2_near',
-        'suburb': 'city_suburb',
-        'city_district': 'city_city_district',
-        'city': 'city_city',
-        'state': 'state',
-        'state_district': 'state',
-        'country': 'country'
+        'po_box': EntityType.PO_BOX,
+        'postcode': EntityType.ZIP,
+        'house_number': EntityType.STREET_HOUSE_NUMBER,
+        'road': EntityType.STREET_ROAD,
+        'unit': EntityType.STREET2_UNIT,
+        'level': EntityType.STREET2_LEVEL,
+        'staircase': EntityType.STREET2_STAIRCASE,
+        'entrance': EntityType.STREET2_ENTRANCE,
+        'house': EntityType.STREET2_HOUSE,
+        'category': EntityType.STREET2_CATEGORY,
+        'near': EntityType.STREET2_NEAR,
+        'suburb': EntityType.CITY_SUBURB,
+        'city_district': EntityType.CITY_CITY_DISTRICT,
+        'city': EntityType.CITY_CITY,
+        'state': EntityType.STATE,
+        'state_district': EntityType.STATE,
+        'country': EntityType.COUNTRY
     }
 
     def _extract(self):
-        ner_pipeline: Pipeline = pipeline('ner', model=self.model, tokenizer=self.tokenizer, grouped_entities=True)
-        extracted: List[Dict[str, Any]] = []
+        extracted: List[Entity] = []
 
         for line_index, line in self.lines.items():
-            entities = ner_pipeline(line)
-
-            delete: List[int] = []
-
-            for index in range(len(entities)):
-                if entities[index]['score'] < 0.9:
-                    delete.append(index)
-
-            for index in sorted(delete, reverse=True):
-                del entities[index]
+            entities: List[Dict[str, Any]] = self.entities[line_index]
 
             print(line)
             print(entities)
@@ -54,11 +44,7 @@ class LocationExtractor(NERExtractingTask):
 
                 for location in locations:
                     if location[1] in self.type_mappings:
-                        extracted.append({
-                            'type': self.type_mappings[location[1]],
-                            'match': location[0],
-                            'index': line_index
-                        })
+                        extracted.append(Entity(self.type_mappings[location[1]], location[0], line_index))
 
         print(f'Locations: {extracted}')
 
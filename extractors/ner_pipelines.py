@@ -0,0 +1,397 @@
+import torch
+
+from threading import Lock
+from typing import Any, Dict, List, Set, Tuple
+from transformers import Pipeline, pipeline
+
+from persistent_cache import PersistentCache
+
+
+class NERModelRegistry:
+    """
+    This is a class to share named entity recognition pipelines between all extractors of a process.
+
+    Every pipeline is identified by its model, tokenizer, device, backend and pipeline options and is loaded only
+    once per process. Besides the fp32 model, a dynamically int8 quantized model can be selected for CPU inference. All NERExtractingTask subclasses retrieve their pipelines from here.
+
+    Public methods:
+        - get: Retrieve the pipeline for the given configuration, loading it on first use.
+        - preload: Load the pipeline for the given configuration ahead of time.
+        - loaded: Retrieve the configurations of all loaded pipelines.
+        - memory_usage: Calculate the memory used by the weights of each loaded pipeline.
+        - clear: Drop all loaded pipelines.
+    """
+
+    _pipelines: Dict[Tuple[Any, ...], Pipeline] = {}
+    _lock: Lock = Lock()
+    _backends = ('fp32', 'quantized')
+
+    @staticmethod
+    def key(model: str, tokenizer: str, device: int = -1, backend: str = 'fp32', **options) -> Tuple[Any, ...]:
+        """
+        Build the registry key for a pipeline configuration.
+
+        :param model: Name of the model.
+        :param tokenizer: Name of the tokenizer.
+        :param device: Device ordinal, -1 for the CPU.
+        :param backend: Inference backend, either fp32 or quantized.
+        :param options: Additional keyword arguments for the pipeline.
+        :return: Registry key.
+        """
+
+        return model, tokenizer, device, backend, tuple(sorted(options.items()))
+
+    @classmethod
+    def get(cls, model: str, tokenizer: str, device: int = -1, backend: str = 'fp32', **options) -> Pipeline:
+        """
+        Retrieve the pipeline for the given configuration, loading it on first use.
+
+        :raise ValueError: If the backend is unknown or not available on the device.
+        :param model: Name of the model.
+        :param tokenizer: Name of the tokenizer.
+        :param device: Device ordinal, -1 for the CPU.
+        :param backend: Inference backend, either fp32 or quantized.
+        :param options: Additional keyword arguments for the pipeline.
+        :return: The shared pipeline.
+        """
+
+        key: Tuple[Any, ...] = cls.key(model, tokenizer, device, backend, **options)
+
+        if key not in cls._pipelines:
+            with cls._lock:
+                if key not in cls._pipelines:
+                    cls._pipelines[key] = cls._load(model, tokenizer, device, backend, **options)
+
+        return cls._pipelines[key]
+
+    @classmethod
+    def _load(cls, model: str, tokenizer: str, device: int, backend: str, **options) -> Pipeline:
+        if backend not in cls._backends:
+            raise ValueError(f'Unknown backend {backend}, expected one of {cls._backends}!')
+
+        if backend == 'quantized' and device != -1:
+            raise ValueError('The quantized backend is only available on the CPU!')
+
+        ner_pipeline: Pipeline = pipeline('ner', model=model, tokenizer=tokenizer, device=device, **options)
+
+        if backend == 'quantized':
+            # Replace the weights of all linear layers by int8 weights, activations are quantized on the fly
+            ner_pipeline.model = torch.quantization.quantize_dynamic(ner_pipeline.model, {torch.nn.Linear},
+                                                                     dtype=torch.qint8)
+
+        return ner_pipeline
+
+    @classmethod
+    def preload(cls, model: str, tokenizer: str, device: int = -1, backend: str = 'fp32', **options):
+        """
+        Load the pipeline for the given configuration ahead of time, e.g. at process startup.
+
+        :param model: Name of the model.
+        :param tokenizer: Name of the tokenizer.
+        :param device: Device ordinal, -1 for the CPU.
+        :param backend: Inference backend, either fp32 or quantized.
+        :param options: Additional keyword arguments for the pipeline.
+        """
+
+        cls.get(model, tokenizer, device, backend, **options)
+
+    @classmethod
+    def loaded(cls) -> Tuple[Tuple[Any, ...], ...]:
+        """
+        Retrieve the configurations of all loaded pipelines.
+
+        :return: Registry keys of the loaded pipelines.
+        """
+
+        return tuple(cls._pipelines.keys())
+
+    @classmethod
+    def memory_usage(cls) -> Dict[Tuple[Any, ...], int]:
+        """
+        Calculate the memory used by the weights and buffers of each loaded pipeline.
+
+        :return: Size in bytes for every registry key.
+        """
+
+        return {key: cls._state_size(ner_pipeline.model.state_dict()) for key, ner_pipeline in cls._pipelines.items()}
+
+    @classmethod
+    def _state_size(cls, value: Any) -> int:
+        if isinstance(value, dict):
+            return sum(cls._state_size(element) for element in value.values())
+
+        if isinstance(value, (list, tuple)):
+            return sum(cls._state_size(element) for element in value)
+
+        if hasattr(value, 'element_size') and hasattr(value, 'numel'):
+            return value.element_size() * value.numel()
+
+        return 0
+
+    @classmethod
+    def clear(cls):
+        """
+        Drop all loaded pipelines.
+        """
+
+        with cls._lock:
+            cls._pipelines.clear()
+
+
+class NamedEntityRecognizer:
+    """
+    This is a class to run a named entity recognition pipeline once over an arbitrary number of lines.
+
+    The recognized entities of a single pass can be shared by every NERExtractingTask that uses the same
+    configuration, so each line goes through the transformer only once per document.
+
+    Instance variables:
+        - model: Name of the model.
+        - tokenizer: Name of the tokenizer.
+        - device: Device ordinal, -1 for the CPU.
+        - backend: Inference backend, either fp32 or quantized.
+        - options: Additional keyword arguments for the pipeline.
+        - min_score: Entities with a lower score are dropped.
+        - batch_size: Number of lines per forward pass.
+        - cache: Optional persistent cache for the entities of each line.
+        - max_tokens: Lines with more tokens are split into overlapping windows of this size.
+        - stride: Number of tokens shared by consecutive windows.
+        - max_line_tokens: Lines with more tokens are skipped, None to never skip lines.
+    """
+
+    def __init__(self, model: str, tokenizer: str, device: int = -1, backend: str = 'fp32',
+                 options: Dict[str, Any] = None, min_score: float = 0.9, batch_size: int = 16,
+                 cache: PersistentCache = None, max_tokens: int = 128, stride: int = 32, max_line_tokens: int = None):
+        """
+        Initialize NamedEntityRecognizer object.
+
+        :param model: Name of the model.
+        :param tokenizer: Name of the tokenizer.
+        :param device: Device ordinal, -1 for the CPU.
+        :param backend: Inference backend, either fp32 or quantized.
+        :param options: Additional keyword arguments for the pipeline.
+        :param min_score: Entities with a lower score are dropped.
+        :param batch_size: Number of lines per forward pass.
+        :param cache: Optional persistent cache for the entities of each line.
+        :param max_tokens: Lines with more tokens are split into overlapping windows of this size.
+        :param stride: Number of tokens shared by consecutive windows.
+        :param max_line_tokens: Lines with more tokens are skipped, None to never skip lines.
+        """
+
+        if not 0 <= stride < max_tokens:
+            raise ValueError('The stride must be smaller than the maximum number of tokens!')
+
+        self._model: str = model
+        self._tokenizer: str = tokenizer
+        self._device: int = device
+        self._backend: str = backend
+        self._options: Dict[str, Any] = dict(options) if options else {}
+        self._min_score: float = min_score
+        self._batch_size: int = batch_size
+        self._cache: PersistentCache = cache
+        self._max_tokens: int = max_tokens
+        self._stride: int = stride
+        self._max_line_tokens: int = max_line_tokens
+
+    def __call__(self, lines: Dict[int, str]) -> Dict[int, List[Dict[str, Any]]]:
+        """
+        Recognize the entities of every line. Lines found in the cache are not sent to the model again.
+
+        :param lines: Arbitrary number of lines.
+        :return: Grouped entities with a sufficient score for every line index.
+        """
+
+        if self.cache is None:
+            recognized: Dict[int, List[Dict[str, Any]]] = self._recognize(lines)
+        else:
+            model_id: str = repr(NERModelRegistry.key(self.model, self.tokenizer, backend=self.backend, **self.options)
+                                 + self._windowing)
+            keys: Dict[int, str] = {line_index: self.cache.key(model_id, line) for line_index, line in lines.items()}
+            cached: Dict[str, List[Dict[str, Any]]] = self.cache.get_many(keys.values())
+            recognized: Dict[int, List[Dict[str, Any]]] = self._recognize(
+                {line_index: line for line_index, line in lines.items() if keys[line_index] not in cached})
+            self.cache.set_many({keys[line_index]: entities for line_index, entities in recognized.items()})
+
+            for line_index, key in keys.items():
+                if key in cached:
+                    recognized[line_index] = cached[key]
+
+        return {line_index: [entity for entity in recognized[line_index] if entity['score'] >= self.min_score]
+                for line_index in lines}
+
+    def _recognize(self, lines: Dict[int, str]) -> Dict[int, List[Dict[str, Any]]]:
+        """
+        Run the model over the lines. Over-long lines are split into overlapping windows, all windows are sorted by
+        their token length and sent to the model in batches, so that windows of a similar length share a batch and
+        padding is kept low. Splitting needs the character offsets of the tokens, which only fast tokenizers provide, so
+        with a slow tokenizer every line is sent whole and truncated by the pipeline as before.
+
+        :param lines: Arbitrary number of lines.
+        :return: All grouped entities for every line index.
+        """
+
+        recognized: Dict[int, List[Dict[str, Any]]] = {line_index: [] for line_index in lines}
+
+        if not lines:
+            return recognized
+
+        ner_pipeline: Pipeline = self.pipeline
+        line_indices: List[int] = list(lines.keys())
+        texts: List[str] = [lines[line_index] for line_index in line_indices]
+        windows: List[Tuple[int, int, str, int]] = []
+
+        if ner_pipeline.tokenizer.is_fast:
+            offset_mappings: List[List[Tuple[int, int]]] = ner_pipeline.tokenizer(
+                texts, add_special_tokens=False, return_offsets_mapping=True)['offset_mapping']
+
+            for line_index, offset_mapping in zip(line_indices, offset_mappings):
+                windows += self._windows(line_index, lines[line_index], len(offset_mapping), offset_mapping)
+        else:
+            input_ids: List[List[int]] = ner_pipeline.tokenizer(texts, add_special_tokens=False)['input_ids']
+
+            for line_index, ids in zip(line_indices, input_ids):
+                windows += self._windows(line_index, lines[line_index], len(ids))
+
+        if not windows:
+            return recognized
+
+        windows = sorted(windows, key=lambda k: k[3])
+        batch_entities: List[List[Dict[str, Any]]] = ner_pipeline([window[2] for window in windows],
+                                                                  batch_size=self.batch_size)
+        # Only lines split into windows need their entities shifted and merged, which relies on their offsets
+        chunked: Set[int] = {window[0] for window in windows if window[1] > 0}
+        shifted: Dict[int, List[Dict[str, Any]]] = {}
+
+        for (line_index, start, _, _), entities in zip(windows, batch_entities):
+            if line_index in chunked:
+                shifted.setdefault(line_index, []).extend(self._shift(entities, start))
+            else:
+                recognized[line_index] = entities
+
+        for line_index, entities in shifted.items():
+            recognized[line_index] = self._merge(entities)
+
+        return recognized
+
+    def _windows(self, line_index: int, line: str, tokens: int,
+                 offset_mapping: List[Tuple[int, int]] = None) -> List[Tuple[int, int, str, int]]:
+        """
+        Split a line into overlapping windows of at most ``max_tokens`` tokens.
+
+        :param line_index: Index of the line.
+        :param line: Content of the line.
+        :param tokens: Number of tokens of the line.
+        :param offset_mapping: Character span of every token of the line, None to keep the line whole.
+        :return: Line index, character offset, text and token length of every window.
+        """
+
+        if self.max_line_tokens is not None and tokens > self.max_line_tokens:
+            return []
+
+        if tokens <= self.max_tokens or offset_mapping is None:
+            return [(line_index, 0, line, tokens)]
+
+        windows: List[Tuple[int, int, str, int]] = []
+
+        for first in range(0, tokens, self.max_tokens - self.stride):
+            last: int = min(first + self.max_tokens, tokens)
+            start, end = offset_mapping[first][0], offset_mapping[last - 1][1]
+            windows.append((line_index, start, line[start:end], last - first))
+
+            if last == tokens:
+                break
+
+        return windows
+
+    @staticmethod
+    def _shift(entities: List[Dict[str, Any]], offset: int) -> List[Dict[str, Any]]:
+        shifted: List[Dict[str, Any]] = []
+
+        for entity in entities:
+            entity = dict(entity)
+            entity['start'] = entity['start'] + offset if entity.get('start') is not None else None
+            entity['end'] = entity['end'] + offset if entity.get('end') is not None else None
+            shifted.append(entity)
+
+        return shifted
+
+    @staticmethod
+    def _merge(entities: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Merge the entities of overlapping windows. Of overlapping entities the longest and then the most certain one is
+        kept, as the other one was usually cut off at the border of a window.
+
+        :param entities: Entities of all windows of a line with offsets relative to the line.
+        :return: Entities without overlaps sorted by their position.
+        """
+
+        merged: List[Dict[str, Any]] = []
+
+        for entity in sorted(entities, key=lambda k: (k['start'], -k['end'])):
+            if merged and entity['start'] < merged[-1]['end']:
+                previous: Dict[str, Any] = merged[-1]
+
+                if (entity['end'] - entity['start'], entity['score']) > (previous['end'] - previous['start'],
+                                                                          previous['score']):
+                    merged[-1] = entity
+            else:
+                merged.append(entity)
+
+        return merged
+
+    @property
+    def key(self) -> Tuple[Any, ...]:
+        return NERModelRegistry.key(self.model, self.tokenizer, self.device, self.backend,
+                                    **self.options) + self._windowing + (self.min_score,)
+
+    @property
+    def _windowing(self) -> Tuple[int, int, int]:
+        return self.max_tokens, self.stride, self.max_line_tokens
+
+    @property
+    def pipeline(self) -> Pipeline:
+        return NERModelRegistry.get(self.model, self.tokenizer, self.device, self.backend, **self.options)
+
+    @property
+    def model(self) -> str:
+        return self._model
+
+    @property
+    def tokenizer(self) -> str:
+        return self._tokenizer
+
+    @property
+    def device(self) -> int:
+        return self._device
+
+    @property
+    def backend(self) -> str:
+        return self._backend
+
+    @property
+    def options(self) -> Dict[str, Any]:
+        return self._options
+
+    @property
+    def min_score(self) -> float:
+        return self._min_score
+
+    @property
+    def batch_size(self) -> int:
+        return self._batch_size
+
+    @property
+    def cache(self) -> PersistentCache:
+        return self._cache
+
+    @property
+    def max_tokens(self) -> int:
+        return self._max_tokens
+
+    @property
+    def stride(self) -> int:
+        return self._stride
+
+    @property
+    def max_line_tokens(self) -> int:
+        return self._max_line_tokens
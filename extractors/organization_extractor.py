@@ -1,7 +1,6 @@
 from typing import Any, Dict, List
 
-from transformers import Pipeline, pipeline
-
+from entity import Entity, EntityType
 from extractors.extracting_tasks import NERExtractingTask
 
 
@@ -10,29 +9,15 @@ class OrganizationExtractor(NERExtractingTask):
     tokenizer = 'xlm-roberta-large-finetuned-conll03-german'
 
     def _extract(self):
-        ner_pipeline: Pipeline = pipeline('ner', model=self.model, tokenizer=self.tokenizer, grouped_entities=True)
-        extracted: List[Dict[str, Any]] = []
+        extracted: List[Entity] = []
 
         for line_index, line in self.lines.items():
-            entities = ner_pipeline(line)
-
-            delete: List[int] = []
-
-            for index in range(len(entities)):
-                if entities[index]['score'] < 0.9:
-                    delete.append(index)
-
-            for index in sorted(delete, reverse=True):
-                del entities[index]
+            entities: List[Dict[str, Any]] = self.entities[line_index]
 
             if any(entity.get('entity_group') == 'ORG' for entity in entities):
                 for entity in entities:
                     if entity['entity_group'] == 'ORG':
-                        extracted.append({
-                            'type': 'organization',
-                            'match': entity['word'],
-                            'index': line_index
-                        })
+                        extracted.append(Entity(EntityType.ORGANIZATION, entity['word'], line_index))
 
         print(f'Organizations: {extracted}')
 
@@ -1,58 +1,96 @@
 import re
 
-from typing import Dict, List, Any, Match
-from phonenumbers import PhoneNumberMatcher, PhoneNumberFormat, number_type, format_number
+from typing import Dict, List, Tuple
+from phonenumbers import PhoneNumberMatch, PhoneNumberMatcher, PhoneNumberFormat, number_type, format_number
 
+from entity import Entity, EntityType
 from extractors.extracting_tasks import ExtractingTask
 
 
 class PhoneNumberExtractor(ExtractingTask):
     type_mappings = {
-        0: 'phone',
-        1: 'mobile',
-        2: 'phone',
-        3: 'fax'
+        0: EntityType.PHONE,
+        1: EntityType.MOBILE,
+        2: EntityType.PHONE,
+        3: EntityType.FAX
     }
+    # A line consisting of a fax label turns the phone numbers of the next line into fax numbers
+    context_free = False
+    _digit = re.compile(r'\d')
+    _min_digits = 3
+    _number_cache: Dict[Tuple[str, str], Tuple[int, str]] = {}
+    _number_cache_size = 100000
 
     def __init__(self, lines: Dict[int, str], country_code: str = None):
         self._country_code: str = country_code
         self._lines: Dict[int, str] = lines
-        self._extracted: List[Dict[str, Any]] = self._extract()
+        self._extracted: List[Entity] = self._extract()
 
         print(lines)
 
-    def _extract(self) -> List[Dict[str, Any]]:
-        extracted: List[Dict[str, Any]] = []
+    def _extract(self) -> List[Entity]:
+        extracted: List[Entity] = []
 
-        last_line: str = ''
+        last_line_is_fax_label: bool = False
 
         for line_index, line in self.lines.items():
-            for match in PhoneNumberMatcher(line, self.country_code):
-                phone_number_type: int = number_type(match.number)
+            digits: int = len(self._digit.findall(line))
 
-                print(match)
-                print(line)
+            # Lines with too few digits cannot contain a phone number and never reach the matcher
+            if digits >= self._min_digits:
+                for match in PhoneNumberMatcher(line, self.country_code):
+                    phone_number_type, phone_number = self._number_details(match)
 
-                substring: Match = re.search(r'[^\d]*?' + re.escape(match.raw_string), line)
+                    if last_line_is_fax_label or 'fax' in self._label(line, match.start).lower():
+                        phone_number_type = 3
 
-                print(r'[^\d]*?' + re.escape(match.raw_string))
-                print(substring)
+                    extracted.append(Entity(self.type_mappings.get(phone_number_type, self.type_mappings[0]), phone_number,
+                                            line_index))
 
-                if substring and ('fax' in substring.group(0).lower() or ('fax' in last_line.lower() and not bool(re.search(r'\d', last_line)))):
-                    phone_number_type = 3
-
-                extracted.append({
-                    'type': self.type_mappings[phone_number_type] if phone_number_type in self.type_mappings else self.type_mappings[0],
-                    'match': format_number(match.number, PhoneNumberFormat.E164),
-                    'index': line_index
-                })
-
-            last_line = line
+            last_line_is_fax_label = digits == 0 and 'fax' in line.lower()
 
         print(f'Phone numbers: {extracted}')
 
         return extracted
 
+    def _number_details(self, match: PhoneNumberMatch) -> Tuple[int, str]:
+        """
+        Retrieve the type and the E164 format of a matched phone number, memoized per raw string and country.
+
+        :param match: The match of the phone number.
+        :return: Type and formatted phone number.
+        """
+
+        key: Tuple[str, str] = (match.raw_string, self.country_code)
+        # The cache is shared between threads, so that it may be cleared between any two lookups
+        details: Tuple[int, str] = self._number_cache.get(key)
+
+        if details is None:
+            if len(self._number_cache) >= self._number_cache_size:
+                self._number_cache.clear()
+
+            details = (number_type(match.number), format_number(match.number, PhoneNumberFormat.E164))
+            self._number_cache[key] = details
+
+        return details
+
+    @staticmethod
+    def _label(line: str, start: int) -> str:
+        """
+        Retrieve the text between the previous digit and the start of a match, e.g. 'Telefax: '.
+
+        :param line: The line of the match.
+        :param start: Start of the match.
+        :return: The label of the match.
+        """
+
+        label_start: int = start
+
+        while label_start > 0 and not line[label_start - 1].isdecimal():
+            label_start -= 1
+
+        return line[label_start:start]
+
     @property
     def country_code(self):
         return self._country_code
@@ -0,0 +1,176 @@
+import re
+
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Match, Pattern, Tuple, Type
+
+from entity import Entity
+from extractors.extracting_tasks import RegExExtractingTask
+
+
+class RegExScanner:
+    """
+    This is a class to extract the matches of several RegExExtractingTask subclasses in a single pass over the lines.
+
+    The patterns of all tasks are compiled once into a single alternation with one named group per task, which finds
+    the spans where any task matches in a single pass. Where matches of different tasks overlap, the alternation only
+    reports the one that starts first, so the span of every reported match is matched again with the own pattern of
+    every task from where its last match ended. This way every task gets the same matches as if it ran on its own. In
+    document level mode the joined text of all lines is scanned at once instead of every line on its own.
+
+    Instance variables:
+        - tasks: RegExExtractingTask subclasses whose patterns are combined.
+        - document_level: Whether the joined text of all lines is scanned at once.
+        - pattern: Compiled combined pattern.
+
+    Public methods:
+        - of: Retrieve the shared scanner for the given tasks.
+        - scan: Extract the matches of all tasks from the lines.
+    """
+
+    _scanners: Dict[Tuple[Tuple[Type[RegExExtractingTask], ...], bool], 'RegExScanner'] = {}
+    _global_flags = re.compile(r'^\(\?([aiLmsux]+)\)')
+
+    def __init__(self, tasks: List[Type[RegExExtractingTask]] = None, document_level: bool = False):
+        """
+        Initialize RegExScanner object.
+
+        :param tasks: RegExExtractingTask subclasses, all registered subclasses if None.
+        :param document_level: Whether the joined text of all lines is scanned at once.
+        """
+
+        self._tasks: Tuple[Type[RegExExtractingTask], ...] = tuple(tasks if tasks is not None
+                                                                   else RegExExtractingTask.registry)
+        self._document_level: bool = document_level
+        self._pattern: Pattern = re.compile('|'.join(f'(?P<_{index}>{self._scoped(task.pattern)})'
+                                                     for index, task in enumerate(self.tasks)))
+
+    @classmethod
+    def of(cls, tasks: List[Type[RegExExtractingTask]] = None, document_level: bool = False) -> 'RegExScanner':
+        """
+        Retrieve the shared scanner for the given tasks, so that their patterns are compiled only once.
+
+        :param tasks: RegExExtractingTask subclasses, all registered subclasses if None.
+        :param document_level: Whether the joined text of all lines is scanned at once.
+        :return: The scanner.
+        """
+
+        key: Tuple[Tuple[Type[RegExExtractingTask], ...], bool] = (
+            tuple(tasks if tasks is not None else RegExExtractingTask.registry), document_level)
+
+        if key not in cls._scanners:
+            cls._scanners[key] = cls(list(key[0]), document_level)
+
+        return cls._scanners[key]
+
+    def scan(self, lines: Dict[int, str]) -> Dict[Type[RegExExtractingTask], List[Entity]]:
+        """
+        Extract the matches of all tasks from the lines in a single pass.
+
+        :param lines: Arbitrary number of lines.
+        :return: Matches in the format of RegExExtractingTask.extracted for every task.
+        """
+
+        extracted: Dict[Type[RegExExtractingTask], List[Entity]] = {task: [] for task in self.tasks}
+
+        if self.document_level:
+            line_indices: List[int] = list(lines.keys())
+            starts: List[int] = []
+            ends: List[int] = []
+            offset: int = 0
+
+            for line in lines.values():
+                starts.append(offset)
+                ends.append(offset + len(line))
+                offset += len(line) + 1
+
+            matches: Iterable[Match] = (match for _, match in RegExExtractingTask.document_matches(
+                self.pattern, lines, lambda k: self.task(k).crosses_lines))
+            self._collect(matches, line_indices, starts, ends, extracted)
+        else:
+            for line_index, line in lines.items():
+                matches: List[Match] = list(self.pattern.finditer(line))
+
+                if matches:
+                    self._collect(matches, [line_index], [0], [len(line)], extracted)
+
+        return extracted
+
+    def _collect(self, matches: Iterable[Match], line_indices: List[int], starts: List[int], ends: List[int],
+                 extracted: Dict[Type[RegExExtractingTask], List[Entity]]):
+        """
+        Extract the matches of every task from the spans of the matches of the combined pattern. No task matches outside
+        of these spans, but within a span the combined pattern only reports the winning match, so every other task
+        searches the span with its own pattern, starting where its own last match ended. A search that runs past the
+        span is kept for the following spans instead of being repeated for each of them.
+
+        :param matches: Matches of the combined pattern in the order of the scanned text.
+        :param line_indices: Index of every line of the scanned text.
+        :param starts: Offset of the start of every line in the scanned text.
+        :param ends: Offset of the end of every line in the scanned text.
+        :param extracted: Matches of every task, to which the found matches are added.
+        """
+
+        resumes: Dict[Type[RegExExtractingTask], int] = {task: 0 for task in self.tasks}
+        # Next own match of every task and the position up to which the task doesn't match before it
+        ahead: Dict[Type[RegExExtractingTask], Tuple[int, Match, int]] = {}
+
+        for match in matches:
+            winner: Type[RegExExtractingTask] = self.task(match)
+            span_end: int = max(match.end(), match.start() + 1)
+
+            if resumes[winner] <= match.start():
+                ahead[winner] = (match.start(), match, match.start())
+
+            for task in self.tasks:
+                position: int = max(resumes[task], match.start())
+
+                while position < span_end:
+                    searched: Tuple[int, Match, int] = ahead.get(task)
+
+                    if searched is None or not searched[0] <= position <= searched[2]:
+                        line_position: int = bisect_right(starts, position) - 1
+                        own: Match = task.compiled().search(
+                            match.string, position, len(match.string) if task.crosses_lines else ends[line_position])
+                        searched = ahead[task] = (position, own, own.start() if own else ends[line_position])
+
+                    _, own, clear_until = searched
+
+                    if own is None:
+                        position = clear_until + 1
+                    elif own.start() < span_end:
+                        extracted[task].append(Entity(task.type, own.group(),
+                                                      line_indices[bisect_right(starts, own.start()) - 1]))
+                        position = own.end() if own.end() > own.start() else own.start() + 1
+                        del ahead[task]
+                    else:
+                        position = span_end
+
+                resumes[task] = position
+
+    def task(self, match: Match) -> Type[RegExExtractingTask]:
+        """
+        Retrieve the task whose pattern produced a match of the combined pattern.
+
+        :param match: Match of the combined pattern.
+        :return: The task.
+        """
+
+        return self.tasks[int(match.lastgroup[1:])]
+
+    def _scoped(self, pattern: str) -> str:
+        # Global inline flags are only allowed at the start of a pattern, so they are turned into scoped flags
+        flags: Match = self._global_flags.match(pattern)
+
+        return f'(?{flags.group(1)}:{pattern[flags.end():]})' if flags else pattern
+
+    @property
+    def tasks(self) -> Tuple[Type[RegExExtractingTask], ...]:
+        return self._tasks
+
+    @property
+    def document_level(self) -> bool:
+        return self._document_level
+
+    @property
+    def pattern(self) -> Pattern:
+        return self._pattern
@@ -1,9 +1,10 @@
+from entity import EntityType
 from extractors.extracting_tasks import RegExExtractingTask
 
 
 class URLExtractor(RegExExtractingTask):
     pattern = r"(?i)\b(?:(?:https?://|www\d{0,3}[.]|[a-z0-9.\-]+[.][a-z]{2,4}/)(?:[^\s()<>]+|\(?:(?:[^\s()<>]+|(?:\(?:[^\s()<>]+\)))*\))+(?:\(?:(?:[^\s()<>]+|(?:\(?:[^\s()<>]+\)))*\)|[^\s`!()\[\]{};:'\".,<>?«»“”‘’]))"
-    type = 'website'
+    type = EntityType.WEBSITE
 
 
 if __name__ == '__main__':
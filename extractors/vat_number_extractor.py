@@ -1,9 +1,10 @@
+from entity import EntityType
 from extractors.extracting_tasks import RegExExtractingTask
 
 
 class VATNumberExtractor(RegExExtractingTask):
     pattern = r'DE?[-\s]?[0-9]{3}[-\s]?[0-9]{3}[-\s]?[0-9]{3}'
-    type = 'vat'
+    type = EntityType.VAT
 
 
 if __name__ == '__main__':
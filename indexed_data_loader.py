@@ -0,0 +1,168 @@
+import json
+import mmap
+import os
+import struct
+import sys
+
+from array import array
+from typing import Any, Dict, Iterator
+
+from contact_data import ContactData
+from data_loader import DataLoader
+
+
+class IndexedDataLoader(DataLoader):
+    """
+    This is a class to load contact data from an indexed record file with random access.
+
+    The record file holds every cleansed entry of a contact data json file as a length-prefixed json record, the index
+    file next to it holds the offset of every record. Both files are memory-mapped, so only the requested record is
+    decoded and processes opening the same files share their pages. The training only fields of a record are stored as
+    a nested json string, which ContactData decodes only on first access and which is dropped in inference only mode.
+
+    Instance variables:
+        - path: Path to the record file, the index file is found at path + '.idx'.
+        - inference_only: Whether the training only fields are dropped.
+
+    Public methods:
+        - convert: Convert a contact data json file into a record file and an index file.
+        - contact_data: Retrieve contact data object at the specified index.
+    """
+
+    _magic = b'CDRIDX1\x00'
+    _header = struct.Struct('<8sQ')
+    _offset = struct.Struct('<Q')
+    _length = struct.Struct('<I')
+
+    def __init__(self, path: str, inference_only: bool = False):
+        """
+        Initialize IndexedDataLoader object.
+
+        :raise FileNotFoundError: If the record file or the index file doesn't exist.
+        :raise ValueError: If the index file is no valid index.
+        :param path: Path to the record file.
+        :param inference_only: Whether the training only fields are dropped.
+        """
+
+        for required in (path, self.index_path(path)):
+            if not os.path.exists(required):
+                raise FileNotFoundError(required)
+
+        self._path: str = path
+        self._lazy: bool = True
+        self._inference_only: bool = inference_only
+        self._raw_data = None
+        self._cleansed_data = None
+        self._corpus_index = None
+        self._line_table = None
+
+        with open(path, 'rb') as records_file, open(self.index_path(path), 'rb') as index_file:
+            self._records: mmap.mmap = self._map(records_file)
+            self._index: mmap.mmap = self._map(index_file)
+
+        magic, self._count = self._header.unpack_from(self._index, 0)
+
+        if magic != self._magic:
+            raise ValueError(f'{self.index_path(path)} is no contact data index!')
+
+    @staticmethod
+    def index_path(path: str) -> str:
+        return f'{path}.idx'
+
+    @staticmethod
+    def _map(file) -> mmap.mmap:
+        # Empty files can't be memory-mapped
+        if os.fstat(file.fileno()).st_size == 0:
+            return mmap.mmap(-1, 1)
+
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @staticmethod
+    def _record(fields: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Move the training only fields of cleansed contact data into a nested json string.
+
+        :param fields: Fields of the contact data.
+        :return: Fields of the record.
+        """
+
+        training_data: Dict[str, Any] = {field: fields.pop(field) for field in ContactData.training_fields}
+        fields['training_data'] = json.dumps(training_data, ensure_ascii=False)
+
+        return fields
+
+    @classmethod
+    def convert(cls, source: str, path: str) -> 'IndexedDataLoader':
+        """
+        Convert a contact data json file into a record file and an index file. The json file is streamed, so that its
+        size isn't limited by the available memory.
+
+        :param source: Path to the contact data json file.
+        :param path: Path to the record file.
+        :return: Loader of the converted file.
+        """
+
+        offsets: array = array('Q')
+
+        with open(path, 'wb') as records_file:
+            for entry in DataLoader(source, lazy=True)._stream_raw_data():
+                record: bytes = json.dumps(cls._record(cls._fields(entry)), ensure_ascii=False).encode('utf-8')
+                offsets.append(records_file.tell())
+                records_file.write(cls._length.pack(len(record)))
+                records_file.write(record)
+
+        if sys.byteorder != 'little':
+            offsets.byteswap()
+
+        with open(cls.index_path(path), 'wb') as index_file:
+            index_file.write(cls._header.pack(cls._magic, len(offsets)))
+            index_file.write(offsets.tobytes())
+
+        return cls(path)
+
+    def contact_data(self, index: int) -> ContactData:
+        """
+        Retrieve contact data object at the specified index by decoding only its record.
+
+        :raise IndexError: If there is no contact data at the specified index.
+        :params index: Index of the specified contact data.
+        :return: Contact data.
+        """
+
+        if index < 0:
+            index += len(self)
+
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+
+        offset: int = self._offset.unpack_from(self._index, self._header.size + self._offset.size * index)[0]
+        length: int = self._length.unpack_from(self._records, offset)[0]
+        start: int = offset + self._length.size
+
+        record: Dict[str, Any] = json.loads(self._records[start:start + length])
+
+        if self.inference_only:
+            del record['training_data']
+
+        return ContactData(record)
+
+    def __iter__(self) -> Iterator[ContactData]:
+        return (self.contact_data(index) for index in range(len(self)))
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {'path': self.path, 'inference_only': self.inference_only}
+
+    def __setstate__(self, state: Dict[str, Any]):
+        self.__init__(state['path'], state['inference_only'])
+
+    def __str__(self):
+        return f'<IndexedDataLoader of {self.path}>'
+
+
+if __name__ == '__main__':
+    # Usage: python indexed_data_loader.py data/imprints_plausible_v2.json data/imprints_plausible_v2.records
+    idl = IndexedDataLoader.convert(source=sys.argv[1], path=sys.argv[2])
+    print(f'{len(idl)} records written to {idl.path}')
@@ -0,0 +1,105 @@
+import ahocorasick
+
+from typing import Any, Dict, Iterable, Set, Tuple
+
+
+class KeywordMatcher:
+    """
+    This is a class to find the occurrences of many terms in a text in a single pass with an Aho-Corasick automaton.
+
+    The automaton is built once per term list, so the cost of a lookup grows with the length of the text instead of
+    the number of terms.
+
+    Instance variables:
+        - terms: Terms to match.
+
+    Public methods:
+        - of: Retrieve the shared matcher for a term list.
+        - for_country: Retrieve the shared matchers for the term lists of a country configuration.
+        - occurring: Retrieve all terms that occur in a text.
+        - occurs_in: Check whether any term occurs in a text.
+    """
+
+    _matchers: Dict[Tuple[str, ...], 'KeywordMatcher'] = {}
+
+    def __init__(self, terms: Iterable[str]):
+        """
+        Initialize KeywordMatcher object.
+
+        :param terms: Terms to match.
+        """
+
+        self._terms: Tuple[str, ...] = tuple(dict.fromkeys(term for term in terms if term))
+        self._automaton: ahocorasick.Automaton = ahocorasick.Automaton()
+
+        for term in self.terms:
+            self._automaton.add_word(term, term)
+
+        if self.terms:
+            self._automaton.make_automaton()
+
+    @classmethod
+    def of(cls, terms: Iterable[str]) -> 'KeywordMatcher':
+        """
+        Retrieve the shared matcher for a term list, so that its automaton is built only once.
+
+        :param terms: Terms to match.
+        :return: The matcher.
+        """
+
+        key: Tuple[str, ...] = tuple(terms)
+
+        if key not in cls._matchers:
+            cls._matchers[key] = cls(key)
+
+        return cls._matchers[key]
+
+    @classmethod
+    def for_country(cls, settings: Dict[str, Any]) -> Dict[str, 'KeywordMatcher']:
+        """
+        Retrieve the shared matchers for the avoid, standalone and arbitrary position terms of a country configuration
+        as found in language_settings.DICTIONARIES. The matchers are shared by their terms, so that changed settings
+        get matchers of their own.
+
+        :param settings: Country specific settings.
+        :return: Matchers for every term list.
+        """
+
+        return {
+            'avoid': cls.of(settings.get('avoid', [])),
+            'standalone': cls.of(settings.get('match', {}).get('standalone', [])),
+            'arbitrary_position': cls.of(settings.get('match', {}).get('arbitrary_position', []))
+        }
+
+    def occurring(self, text: str) -> Set[str]:
+        """
+        Retrieve all terms that occur in a text.
+
+        :param text: Text to search.
+        :return: Occurring terms.
+        """
+
+        if not self.terms:
+            return set()
+
+        return {term for _, term in self._automaton.iter(text)}
+
+    def occurs_in(self, text: str) -> bool:
+        """
+        Check whether any term occurs in a text.
+
+        :param text: Text to search.
+        :return: True if at least one term occurs.
+        """
+
+        if not self.terms:
+            return False
+
+        return next(self._automaton.iter(text), None) is not None
+
+    @property
+    def terms(self) -> Tuple[str, ...]:
+        return self._terms
+
+    def __str__(self):
+        return f'<KeywordMatcher of {len(self.terms)} terms>'
@@ -12,7 +12,7 @@ from extractors.relevant_lines.relevant_lines_extractors import TFIDFLogisticReg
 from extractors.terms.standalone_extractors import StandaloneExtractor
 from extractors.urls.url_extractors import RegExURLExtractor
 
-# Country specific settings
+# Country specific settings, the NER backend is either 'fp32' or 'quantized' (int8, CPU only)
 DICTIONARIES = {
     'AT': {
         'avoid': [
@@ -27,10 +27,11 @@ DICTIONARIES = {
                 'konto'
             ]
         },
-        #'named_entity_recognition': {
-        #    'model': 'xlm-roberta-large-finetuned-conll03-german',
-        #    'tokenizer': 'xlm-roberta-large-finetuned-conll03-german'
-        #}
+        'named_entity_recognition': {
+            'model': 'xlm-roberta-large-finetuned-conll03-german',
+            'tokenizer': 'xlm-roberta-large-finetuned-conll03-german',
+            'backend': 'fp32'
+        }
     },
     'DE': {
         'avoid': [
@@ -45,10 +46,11 @@ DICTIONARIES = {
                 'konto'
             ]
         },
-        #'named_entity_recognition': {
-        #    'model': 'xlm-roberta-large-finetuned-conll03-german',
-        #    'tokenizer': 'xlm-roberta-large-finetuned-conll03-german'
-        #}
+        'named_entity_recognition': {
+            'model': 'xlm-roberta-large-finetuned-conll03-german',
+            'tokenizer': 'xlm-roberta-large-finetuned-conll03-german',
+            'backend': 'fp32'
+        }
     }
 }
 
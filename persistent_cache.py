@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import sqlite3
+
+from threading import Lock
+from typing import Any, Dict, Iterable, List
+
+
+class PersistentCache:
+    """
+    This is a class to persist JSON serializable values on disk in a SQLite database.
+
+    Entries are addressed by content hashes, evicted in least recently used order once the cache holds more than
+    ``max_entries`` entries and shared by all processes opening the same file. The access stamps are drawn from the
+    database inside the write transaction, so that the order is kept across processes. Counting the entries scans the
+    whole index, so that the size is only checked every ``_eviction_interval`` inserted values of a process and the
+    cache may briefly exceed ``max_entries`` by that much per process.
+
+    Instance variables:
+        - path: Path to the SQLite database file.
+        - max_entries: Maximum number of entries.
+        - hits: Number of keys found in the cache.
+        - misses: Number of keys not found in the cache.
+
+    Public methods:
+        - key: Build the content hash for arbitrary string parts.
+        - get_many: Retrieve the values of all cached keys.
+        - set_many: Cache the given values.
+        - clear: Remove all entries.
+    """
+
+    _chunk_size = 500
+    _eviction_interval = 1000
+
+    def __init__(self, path: str, max_entries: int = 1000000):
+        """
+        Initialize PersistentCache object.
+
+        :param path: Path to the SQLite database file.
+        :param max_entries: Maximum number of entries.
+        """
+
+        self._path: str = path
+        self._max_entries: int = max_entries
+        self._hits: int = 0
+        self._misses: int = 0
+        self._lock: Lock = Lock()
+        self._connection: sqlite3.Connection = None
+        self._pid: int = None
+        self._inserted: int = 0
+
+    @staticmethod
+    def key(*parts: str) -> str:
+        """
+        Build the content hash for arbitrary string parts.
+
+        :param parts: Parts that identify the value.
+        :return: Hex digest of the parts.
+        """
+
+        return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """
+        Retrieve the values of all cached keys and mark them as recently used.
+
+        :param keys: Keys to look up.
+        :return: Values of the keys found in the cache.
+        """
+
+        unique: List[str] = list(dict.fromkeys(keys))
+        found: Dict[str, Any] = {}
+
+        with self._lock:
+            connection: sqlite3.Connection = self._connect()
+
+            for start in range(0, len(unique), self._chunk_size):
+                chunk: List[str] = unique[start:start + self._chunk_size]
+                rows = connection.execute(f'SELECT key, value FROM entries WHERE key IN ({",".join("?" * len(chunk))})',
+                                          chunk).fetchall()
+
+                for key, value in rows:
+                    found[key] = json.loads(value)
+
+            if found:
+                with connection:
+                    stamp: int = self._stamp(connection)
+                    connection.executemany('UPDATE entries SET accessed = ? WHERE key = ?',
+                                           [(stamp, key) for key in found])
+
+            self._hits += len(found)
+            self._misses += len(unique) - len(found)
+
+        return found
+
+    def set_many(self, values: Dict[str, Any]):
+        """
+        Cache the given values and evict the least recently used entries above ``max_entries``.
+
+        :param values: Values for every key.
+        """
+
+        if not values:
+            return
+
+        with self._lock:
+            connection: sqlite3.Connection = self._connect()
+
+            # Commits the transaction or rolls it back, if a value can't be serialized
+            with connection:
+                stamp: int = self._stamp(connection)
+                connection.executemany('INSERT OR REPLACE INTO entries (key, value, accessed) VALUES (?, ?, ?)',
+                                       [(key, json.dumps(value, default=lambda k: k.item()), stamp)
+                                        for key, value in values.items()])
+                self._inserted += len(values)
+
+                if self._inserted >= self._eviction_interval:
+                    self._inserted = 0
+                    surplus: int = connection.execute('SELECT COUNT(*) FROM entries').fetchone()[0] - self.max_entries
+
+                    if surplus > 0:
+                        connection.execute('DELETE FROM entries WHERE key IN '
+                                           '(SELECT key FROM entries ORDER BY accessed LIMIT ?)', (surplus,))
+
+    def clear(self):
+        """
+        Remove all entries and reset the counters.
+        """
+
+        with self._lock:
+            connection: sqlite3.Connection = self._connect()
+            connection.execute('DELETE FROM entries')
+            connection.commit()
+            self._hits = 0
+            self._misses = 0
+
+    @staticmethod
+    def _stamp(connection: sqlite3.Connection) -> int:
+        # Take the write lock before reading the newest stamp, so that no other process can draw the same one
+        connection.execute('BEGIN IMMEDIATE')
+
+        return connection.execute('SELECT COALESCE(MAX(accessed), 0) + 1 FROM entries').fetchone()[0]
+
+    def _connect(self) -> sqlite3.Connection:
+        # Connections must not be shared with forked processes, so every process opens its own
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS entries '
+                                     '(key TEXT PRIMARY KEY, value TEXT NOT NULL, accessed INTEGER NOT NULL)')
+            self._connection.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+            self._pid = os.getpid()
+
+        return self._connection
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connect().execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {'path': self.path, 'max_entries': self.max_entries}
+
+    def __setstate__(self, state: Dict[str, Any]):
+        self.__init__(path=state['path'], max_entries=state['max_entries'])
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def max_entries(self) -> int:
+        return self._max_entries
+
+    @property
+    def hits(self) -> int:
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        return self._misses
+
+    def __str__(self):
+        return f'<PersistentCache of {self.path}>'
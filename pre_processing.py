@@ -3,11 +3,140 @@ import re
 
 from typing import List, Dict, Any, Tuple
 from bs4 import BeautifulSoup
+from lxml import etree
 
 from contact_data import ContactData
 from data_loader import DataLoader
 
 
+class HTMLLineParser:
+    """
+    This is a class to convert html content into text lines in a single pass over the events of the lxml parser.
+
+    It produces the same lines as PreProcessing.remove_blank_lines without building a tree or serializing tags: the
+    content of unwanted tags is skipped, the text of a-tags is buffered until the end of the tag and only kept if the
+    tag contains mail, tel or url content.
+
+    Public methods:
+        - lines: Convert html content into text lines.
+    """
+
+    removed_tags = frozenset(['img', 'figure', 'video', 'style', 'script', 'input', 'select', 'i', 'br'])
+    contact_markers = ('mailto:', 'tel:', '@', '(at)')
+    url_pattern = re.compile(r"(?i)\b((?:https?://|www\d{0,3}[.]|[a-z0-9.\-]+[.][a-z]{2,4}/)(?:[^\s()<>]+|\(([^\s()<>]+|(\([^\s()<>]+\)))*\))+(?:\(([^\s()<>]+|(\([^\s()<>]+\)))*\)|[^\s`!()\[\]{};:'\".,<>?«»“”‘’]))")
+
+    def __init__(self):
+        """
+        Initialize HTMLLineParser object.
+        """
+
+        self._strings: List[str] = []
+        self._data: List[str] = []
+        self._anchors: List[Dict[str, List[str]]] = []
+        self._removed_depth: int = 0
+        self._template_depth: int = 0
+
+    @classmethod
+    def lines(cls, html: str) -> List[str]:
+        """
+        Convert html content into text lines.
+
+        :param html: The html content.
+        :return: Non-blank text lines of the html content.
+        """
+
+        if not html.strip():
+            return ['']
+
+        parser: etree.HTMLParser = etree.HTMLParser(target=cls(), strip_cdata=False, recover=True)
+        parser.feed(html)
+
+        return parser.close()
+
+    def start(self, tag: str, attrib: Dict[str, str]):
+        self._flush()
+
+        if self._removed_depth or tag in self.removed_tags:
+            self._removed_depth += 1
+
+            return
+
+        if tag == 'template':
+            self._template_depth += 1
+
+        if tag == 'a':
+            self._anchors.append({'strings': [], 'content': list(attrib.values())})
+        elif self._anchors:
+            self._anchors[-1]['content'].extend(attrib.values())
+
+    def end(self, tag: str):
+        self._flush()
+
+        if self._removed_depth:
+            self._removed_depth -= 1
+
+            return
+
+        if tag == 'template':
+            self._template_depth -= 1
+
+        if tag == 'a' and self._anchors:
+            anchor: Dict[str, List[str]] = self._anchors.pop()
+            content: str = ' '.join(anchor['content'])
+            keep: bool = any(marker in content for marker in self.contact_markers) or bool(
+                self.url_pattern.search(content))
+
+            if self._anchors:
+                self._anchors[-1]['content'].extend(anchor['content'])
+
+                if keep:
+                    self._anchors[-1]['strings'].extend(anchor['strings'])
+            elif keep:
+                self._strings.extend(anchor['strings'])
+
+    def data(self, data: str):
+        if not self._removed_depth:
+            self._data.append(data)
+
+    def comment(self, text: str):
+        self._flush()
+
+        if not self._removed_depth and self._anchors:
+            self._anchors[-1]['content'].append(text)
+
+    def pi(self, target: str, data: str = None):
+        self.comment(f'{target} {data}' if data else target)
+
+    def close(self) -> List[str]:
+        self._flush()
+        lines: List[str] = []
+
+        for string in self._strings:
+            lines += [line for line in string.strip().split('\n') if line.strip() != '']
+
+        return lines if lines else ['']
+
+    def _flush(self):
+        # lxml may deliver the text of a node in several chunks, so a string ends only at the next non-text event
+        if not self._data:
+            return
+
+        string: str = ''.join(self._data)
+        self._data = []
+
+        if self._anchors:
+            self._anchors[-1]['content'].append(string)
+
+        # Strings inside of template tags are not part of the text content
+        if self._template_depth:
+            return
+
+        if self._anchors:
+            self._anchors[-1]['strings'].append(string)
+        else:
+            self._strings.append(string)
+
+
 class PreProcessing:
     """
     This is a class of util functions for natural language processing tasks on the web scraped contact data.
@@ -19,6 +148,7 @@ class PreProcessing:
         - prettify_html: Prettify the html content of raw_input.
         - remove_html: Remove the html content of raw_input.
         - remove_blank_lines: Remove consecutive blank lines from text content of contact data.
+        - split_lines: Split text content of contact data at line breaks.
     """
 
     def __init__(self, contact_data: ContactData):
@@ -69,12 +199,13 @@ class PreProcessing:
 
     def split_lines(self) -> List[str]:
         """
-        Split text content of contact data at line breaks.
+        Split text content of contact data at line breaks. The lines equal those of remove_blank_lines but are produced
+        in a single pass over the html content.
 
         :return: List of split lines of the contact data.
         """
 
-        return self.remove_blank_lines().split('\n')
+        return HTMLLineParser.lines(self.contact_data.raw_input)
 
     @property
     def contact_data(self):
@@ -0,0 +1,124 @@
+import asyncio
+import os
+import tempfile
+
+from typing import Any, Callable, Dict, List
+
+import pytest
+
+from contact_data import ContactData
+from extraction_service import ExtractionClient, ExtractionService, NERMicroBatcher
+
+
+class StubRecognizer:
+    """
+    Recognizer that tags every line as one entity and records the count of lines of every call.
+    """
+
+    key = ('stub',)
+
+    def __init__(self):
+        self.calls: List[int] = []
+
+    def __call__(self, lines: Dict[int, str]) -> Dict[int, List[Dict[str, Any]]]:
+        self.calls.append(len(lines))
+
+        return {line_index: [{'entity_group': 'ORG', 'word': line}] for line_index, line in lines.items()}
+
+
+class StubRetrieval:
+    """
+    Retrieval that recognizes the lines of the raw input with the stub recognizer and fails for documents whose first
+    line is "fail" after their lines were recognized.
+    """
+
+    recognizer: StubRecognizer = None
+
+    def __init__(self, contact_data: ContactData, filters: List[str] = None, settings: Dict[str, Any] = None,
+                 recognize: Callable = None):
+        self._lines: Dict[int, str] = dict(enumerate(contact_data.raw_input.split('\n')))
+        self._entities: Dict[int, List[Dict[str, Any]]] = recognize(self.recognizer, self._lines)
+
+    def blocks(self) -> Dict[str, Any]:
+        if self._lines[0] == 'fail':
+            raise ValueError('stub failure')
+
+        return {'organizations': [self._entities[line_index][0]['word'] for line_index in sorted(self._entities)]}
+
+
+class StubService(ExtractionService):
+    retrieval = StubRetrieval
+
+
+def document(lines: List[str]) -> Dict[str, Any]:
+    return {'country_code': 'DE', 'raw_input': '\n'.join(lines), 'crawled_imprint': 'https://example.de/impressum',
+            'crawled_website': 'https://example.de'}
+
+
+async def extract_concurrently(documents: List[Dict[str, Any]]) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as directory:
+        path: str = os.path.join(directory, 'service.sock')
+        service: ExtractionService = StubService(filters=['organizations'], max_batch_size=1000, max_wait=200)
+        client: ExtractionClient = ExtractionClient()
+        await service.start(path=path)
+
+        try:
+            await client.connect(path=path)
+            results: List[Any] = await asyncio.gather(*(client.extract(contact_data) for contact_data in documents),
+                                                      return_exceptions=True)
+            stats: Dict[str, Any] = await client.stats()
+            await client.close()
+        finally:
+            await service.close()
+
+    return {'results': results, 'stats': stats}
+
+
+@pytest.mark.skipif(not hasattr(asyncio, 'start_unix_server'), reason='unix sockets are not available')
+def test_concurrent_requests():
+    StubRetrieval.recognizer = StubRecognizer()
+    documents: List[List[str]] = [[f'Company {index} line {line}' for line in range(3)] for index in range(8)]
+    documents.insert(3, ['fail', 'Failing Company'])
+
+    outcome: Dict[str, Any] = asyncio.run(extract_concurrently([document(lines) for lines in documents]))
+    results: List[Any] = outcome['results']
+    stats: Dict[str, Any] = outcome['stats']
+
+    # Every answer belongs to its own request, only the failing request fails
+    for lines, result in zip(documents, results):
+        if lines[0] == 'fail':
+            assert isinstance(result, RuntimeError)
+            assert 'stub failure' in str(result)
+        else:
+            assert result == {'organizations': lines}
+
+    # The lines of the concurrent documents were recognized together
+    assert stats['mean_batch_size'] > 3
+    assert max(StubRetrieval.recognizer.calls) > 3
+
+    assert stats['requests'] == 8
+    assert stats['errors'] == 1
+    assert None not in (stats['p50'], stats['p95'], stats['p99'])
+    assert 0 <= stats['p50'] <= stats['p95'] <= stats['p99']
+
+
+def test_batches_stay_within_the_maximum_batch_size():
+    recognizer: StubRecognizer = StubRecognizer()
+    documents: List[Dict[int, str]] = [{index: f'Document {document} line {index}' for index in range(size)}
+                                       for document, size in enumerate((200, 200, 300, 20))]
+
+    async def recognize_concurrently() -> List[Dict[int, List[Dict[str, Any]]]]:
+        batcher: NERMicroBatcher = NERMicroBatcher(max_batch_size=256, max_wait=50)
+
+        try:
+            return await asyncio.gather(*(batcher.recognize(recognizer, lines) for lines in documents))
+        finally:
+            batcher.close()
+
+    results: List[Dict[int, List[Dict[str, Any]]]] = asyncio.run(recognize_concurrently())
+
+    # A document that doesn't fit sends the pending batch off, a document above the limit is recognized on its own
+    assert recognizer.calls == [200, 200, 300, 20]
+
+    for lines, entities in zip(documents, results):
+        assert {line_index: entity[0]['word'] for line_index, entity in entities.items()} == lines